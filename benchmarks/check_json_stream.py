@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Check the streaming USDA JSON reader at every chunk boundary.
+
+Parses a few small FoodData Central-shaped documents with iter_foods() at
+every READ_SIZE from 1 to 32 bytes, so each number, string, escape and
+multi-byte character gets split across two chunks somewhere, and checks:
+
+- the foods match what json.loads finds in the "...Foods" lists
+- malformed documents raise ValueError instead of yielding a partial list
+
+Runs against a temporary directory, never data/.
+
+    python3 benchmarks/check_json_stream.py
+    python3 benchmarks/check_json_stream.py --max-read-size 64
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import lookup_usda  # noqa: E402
+
+VALID = [
+    '{"a": 12.5, "FoundationFoods": [{"fdcId": 1, "amount": -1.5e-3}, {"fdcId": 2, "amount": 10}]}',
+    '{"n": -0.25E+2, "t": true, "z": null, "s": "caf\\u00e9 ✓", "SRLegacyFoods": [],'
+    ' "BrandedFoods": [{"fdcId": 3, "description": "Crème fraîche \\"full\\""}, 1e5, 7], "m": 7}',
+    '{ "FoundationFoods" : [ { "a" : [ 1 , 2.0 , 3e1 ] } , 0 ] , "k" : 123456789 }\n',
+    '{"FoundationFoods": [-4], "SurveyFoods": [{"x": {"y": [0.5]}}]}',
+    '{}',
+]
+
+INVALID = [
+    '{"a": 12.',
+    '{"FoundationFoods": [1,]}',
+    '{"FoundationFoods": [{"fdcId": 1}]',
+    '{"FoundationFoods": []} []',
+    '[1, 2]',
+]
+
+
+def expected_foods(text: str) -> list:
+    foods = []
+    for key, value in json.loads(text).items():
+        if key.endswith("Foods") and isinstance(value, list):
+            foods.extend(value)
+    return foods
+
+
+def check(root: Path, max_read_size: int) -> list:
+    """Problems found parsing every document at every READ_SIZE."""
+    problems = []
+    saved = lookup_usda.READ_SIZE
+    try:
+        for n, text in enumerate(VALID + INVALID):
+            path = root / f"doc{n}.json"
+            path.write_text(text, encoding="utf-8")
+            for size in range(1, max_read_size + 1):
+                lookup_usda.READ_SIZE = size
+                try:
+                    foods = list(lookup_usda.iter_foods(path))
+                except ValueError as e:
+                    if text in VALID:
+                        problems.append(f"READ_SIZE {size}: {text!r} raised {e}")
+                    continue
+                if text in INVALID:
+                    problems.append(f"READ_SIZE {size}: {text!r} parsed, should have failed")
+                elif foods != expected_foods(text):
+                    problems.append(f"READ_SIZE {size}: {text!r} gave {foods!r}")
+    finally:
+        lookup_usda.READ_SIZE = saved
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse sample USDA JSON at every chunk size")
+    parser.add_argument("--max-read-size", type=int, default=32, help="Largest READ_SIZE to try (default: 32)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        problems = check(Path(tmp), args.max_read_size)
+    documents = len(VALID) + len(INVALID)
+    if problems:
+        print(f"FAIL  {documents} documents, READ_SIZE 1-{args.max_read_size}, {len(problems)} problems")
+        for problem in problems:
+            print(f"    {problem}")
+        sys.exit(1)
+    print(f"ok    {documents} documents, READ_SIZE 1-{args.max_read_size}")
+
+
+if __name__ == "__main__":
+    main()
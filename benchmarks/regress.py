@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Benchmark regression gate: re-run the benchmarks and compare with a baseline.
+
+    python3 benchmarks/regress.py save             # run the gate suite, store benchmarks/baseline.json
+    python3 benchmarks/regress.py check            # run it again, exit 1 if anything regressed
+    python3 benchmarks/regress.py compare OLD NEW  # compare two run.py/regress.py reports
+
+The gate suite runs offline in under a minute: 1k and 10k synthetic intake
+entries, 365 and 3k synthetic USDA foods and the bundled USDA file, with
+lookup (exact, typo, miss and common-word searches, FDC IDs), log (entries
+and templates), search, edit, delete and summary operations (see run.py),
+20 warm runs each.
+
+An operation regresses when its median or p95 time grows by more than
+--tolerance (default 25%) and by more than --min-delta-ms (default 1 ms;
+smaller changes are timer noise), or its peak RSS grows by more than
+--rss-tolerance (default 20%) and 1 MB. A busy machine slows whole runs
+down by that much, so when check finds regressions it runs the suite
+again (up to --attempts times in all) and keeps each operation's best
+numbers; a real regression shows up in every attempt. The common-word
+searches (usda.search_common) must also be no slower than scoring every
+food (usda.search_scan) in the same run. An operation in
+the baseline that the run no longer has fails the check as well, unless
+--allow-missing is given (or save a new baseline). Timings only
+compare on the same machine: save the baseline where check runs, and
+save again after a change that is meant to be slower.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import run
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+
+GATE_INTAKE_SIZES = [1_000, 10_000]
+GATE_USDA_SIZES = [365, 3_000]
+GATE_REPEAT = 20
+GATE_ATTEMPTS = 3
+
+TIME_METRICS = ("median_s", "p95_s")
+RSS_METRIC = "peak_rss_kb"
+MIN_RSS_DELTA_KB = 1024
+
+
+def _key(result: dict) -> tuple:
+    return result["name"], result.get("data", "synthetic"), result["size"]
+
+
+def _change(old, new) -> str:
+    if not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def _regressed(old, new, tolerance: float, min_delta: float) -> bool:
+    return old is not None and new is not None and new > old * (1 + tolerance) and new - old > min_delta
+
+
+def best_of(first: dict, second: dict) -> dict:
+    """Report with each operation's lower time and memory figures from two runs of the same suite."""
+    other = {_key(r): r for r in second["results"]}
+    results = []
+    for result in first["results"]:
+        again = other.get(_key(result))
+        if again:
+            result = dict(result)
+            for metric in (*TIME_METRICS, "min_s", RSS_METRIC):
+                if again.get(metric) is not None and (result.get(metric) is None or again[metric] < result[metric]):
+                    result[metric] = again[metric]
+        results.append(result)
+    return {"meta": first["meta"], "results": results}
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.25, rss_tolerance: float = 0.2,
+            min_delta_ms: float = 1.0) -> list:
+    """Compare two reports; returns (status, text) per operation.
+
+    status is "regressed", "improved" (faster or smaller by more than the
+    tolerance), "same", "missing" or "new".
+    """
+    lines = []
+    now = {_key(r): r for r in current["results"]}
+    for old in baseline["results"]:
+        key = _key(old)
+        label = f"{old['name']:26s} {old.get('data', 'synthetic'):9s} {old['size']:>8d}"
+        new = now.pop(key, None)
+        if new is None:
+            lines.append(("missing", f"  {label}  missing from this run"))
+            continue
+        cells, regressed, improved = [], False, False
+        for metric in TIME_METRICS:
+            regressed |= _regressed(old[metric], new[metric], tolerance, min_delta_ms / 1000)
+            improved |= _regressed(new[metric], old[metric], tolerance, min_delta_ms / 1000)
+            cells.append(f"{metric[:-2]} {old[metric] * 1000:8.2f} -> {new[metric] * 1000:8.2f} ms "
+                         f"{_change(old[metric], new[metric]):>6s}")
+        if old.get(RSS_METRIC) and new.get(RSS_METRIC):
+            regressed |= _regressed(old[RSS_METRIC], new[RSS_METRIC], rss_tolerance, MIN_RSS_DELTA_KB)
+            improved |= _regressed(new[RSS_METRIC], old[RSS_METRIC], rss_tolerance, MIN_RSS_DELTA_KB)
+            cells.append(f"rss {old[RSS_METRIC] / 1024:6.1f} -> {new[RSS_METRIC] / 1024:6.1f} MB "
+                         f"{_change(old[RSS_METRIC], new[RSS_METRIC]):>6s}")
+        status = "regressed" if regressed else "improved" if improved else "same"
+        lines.append((status, f"{'!!' if regressed else '  '}{label}  {'  '.join(cells)}"))
+    for key in now:
+        lines.append(("new", f"  {key[0]:26s} {key[1]:9s} {key[2]:>8d}  new, not in the baseline"))
+    return lines
+
+
+def report_differences(baseline: dict, current: dict, args) -> int:
+    """Print the comparison; returns the exit code (1 if anything regressed or is missing)."""
+    for field in ("python", "platform", "numpy", "seed"):
+        if baseline["meta"].get(field) != current["meta"].get(field):
+            print(f"Note: {field} differs from the baseline "
+                  f"({baseline['meta'].get(field)} vs {current['meta'].get(field)})")
+    lines = compare(baseline, current, args.tolerance, args.rss_tolerance, args.min_delta_ms)
+    for status, text in lines:
+        if args.verbose or status != "same":
+            print(text)
+    regressions = sum(1 for status, _ in lines if status == "regressed")
+    missing = 0 if args.allow_missing else sum(1 for status, _ in lines if status == "missing")
+    slow = run.slower_than_scan(current["results"])
+    print()
+    if regressions or missing or slow:
+        problems = []
+        if regressions:
+            problems.append(f"{regressions} of {len(baseline['results'])} operations regressed "
+                            f"(marked !!; tolerance {args.tolerance:.0%} time, {args.rss_tolerance:.0%} memory)")
+        if missing:
+            problems.append(f"{missing} baseline operations missing from this run (--allow-missing to ignore)")
+        if slow:
+            problems.append("usda.search_common is slower than usda.search_scan on "
+                            + ", ".join(f"{data} {size}" for data, size in slow))
+        print(f"FAIL: {'; '.join(problems)}")
+        return 1
+    print(f"OK: no regressions in {len(baseline['results'])} operations against the baseline "
+          f"from {baseline['meta'].get('created')} (commit {baseline['meta'].get('commit')})")
+    return 0
+
+
+def load(path: Path) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Error: {path} not found" + (" - run `regress.py save` first" if path == BASELINE_FILE else ""))
+        sys.exit(2)
+
+
+def run_gate(args) -> dict:
+    return run.run_suite(GATE_INTAKE_SIZES, GATE_USDA_SIZES, args.repeat, 0, args.data_dir, bundled=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when benchmarks regress against a stored baseline")
+    parser.add_argument("command", choices=("save", "check", "compare"))
+    parser.add_argument("reports", nargs="*", type=Path, help="compare: baseline and current report files")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE,
+                        help="Baseline report (default: benchmarks/baseline.json)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed growth of median and p95 time (default: 0.25 = 25%%)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.2,
+                        help="Allowed growth of peak RSS (default: 0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore time changes smaller than this (default: 1 ms)")
+    parser.add_argument("--repeat", type=int, default=GATE_REPEAT,
+                        help=f"Warm runs per benchmark (default: {GATE_REPEAT})")
+    parser.add_argument("--attempts", type=int, default=GATE_ATTEMPTS,
+                        help=f"check: runs before a regression counts (default: {GATE_ATTEMPTS})")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Don't fail when operations in the baseline are missing from this run")
+    parser.add_argument("--data-dir", type=Path, help="Keep generated datasets here and reuse them")
+    parser.add_argument("-o", "--output", type=Path, help="check: also write this run's report here")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="List every operation, not just regressions, improvements and changes to the suite")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        if len(args.reports) != 2:
+            parser.error("compare takes two report files: BASELINE CURRENT")
+        sys.exit(report_differences(load(args.reports[0]), load(args.reports[1]), args))
+    if args.reports:
+        parser.error(f"{args.command} takes no report files")
+
+    if args.command == "save":
+        report = run_gate(args)
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline of {len(report['results'])} operations to {args.baseline}")
+        return
+
+    baseline = load(args.baseline)
+    report = run_gate(args)
+    for attempt in range(2, args.attempts + 1):
+        lines = compare(baseline, report, args.tolerance, args.rss_tolerance, args.min_delta_ms)
+        regressions = sum(1 for status, _ in lines if status == "regressed")
+        if not regressions:
+            break
+        print(f"{regressions} operations look slower; running again ({attempt} of {args.attempts})",
+              file=sys.stderr)
+        report = best_of(report, run_gate(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    sys.exit(report_differences(baseline, report, args))
+
+
+if __name__ == "__main__":
+    main()
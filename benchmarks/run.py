@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Time each script's core operation on synthetic data at several sizes.
+
+For every intake size a synthetic intake.csv (see synthetic.py) is copied
+into a temporary data directory and the operations behind log_entry.py,
+log_template.py, edit_entry.py, search_entries.py, daily_summary.py and
+weekly_summary.py run in this process against it; for every USDA size the
+same is done for lookup_usda.py (compiling the dataset, searches and FDC
+ID lookups). The scripts' own main() is called where it is the operation,
+with output discarded, so the numbers include argument parsing and
+formatting.
+usda.search_scan scores the common-word queries against every food; the
+run fails if usda.search_common is slower than that on any dataset.
+
+Each benchmark runs once cold and then --repeat times warm. Cold intake
+runs start without rollup and index caches; cold USDA runs start with the
+dataset unloaded (usda.build_store times compiling it from JSON). One more
+run happens in a fresh Python process set up on the same files, for the
+peak resident memory of a process doing the operation (None where it
+can't be read). The JSON report goes to stdout (or --output) and a table
+to stderr:
+
+    {"meta": {...}, "results": [{"name": "intake.daily_summary", "data": "synthetic",
+      "size": 10000, "cold_s": 0.05, "median_s": 0.002, "p95_s": 0.003, "min_s": 0.002,
+      "runs": 5, "peak_rss_kb": 24312}, ...]}
+
+With --bundled the lookups also run on the bundled data/usda file
+("data": "bundled"). regress.py compares reports against a baseline.
+
+    python3 benchmarks/run.py -o report.json            # 1k-100k entries, 365-30k foods
+    python3 benchmarks/run.py --full --data-dir /tmp/bench  # up to 1M entries and 300k foods
+    python3 benchmarks/run.py --intake-sizes 10k --usda-sizes none --repeat 20
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import columnar  # noqa: E402
+import daily_summary  # noqa: E402
+import delete_entry  # noqa: E402
+import edit_entry  # noqa: E402
+import intake_store  # noqa: E402
+import log_entry  # noqa: E402
+import log_template  # noqa: E402
+import lookup_usda  # noqa: E402
+import manage_templates  # noqa: E402
+import search_entries  # noqa: E402
+import synthetic  # noqa: E402
+import weekly_summary  # noqa: E402
+
+INTAKE_SIZES = [1_000, 10_000, 100_000]
+USDA_SIZES = [365, 3_000, 30_000]
+# Added by --full
+FULL_INTAKE_SIZES = [1_000_000]
+FULL_USDA_SIZES = [300_000]
+
+# Lookups go through different scoring tiers, so each gets its own benchmark
+SEARCHES = {
+    "exact": ["chicken breast", "apples raw", "peanut butter", "grade a large eggs"],
+    "typo": ["chiken", "brocoli", "yoghurt"],
+    "miss": ["xyzzy", "qwerty zxcv"],
+    # Short words the index matches in most foods; must not lose to usda.search_scan
+    "common": ["grade a large eggs", "a"],
+}
+
+# The USDA file shipped in data/usda/ (before usda_benchmarks points lookup_usda elsewhere)
+BUNDLED_USDA = lookup_usda.DATA_FILE
+
+# Template logged by intake.log_template, with nutrients snapshotted from BUNDLED_USDA
+TEMPLATE = "benchmark_breakfast"
+TEMPLATE_FOODS = [
+    {"food_name": "Oats", "amount_g": 50, "usda_fdc_id": 101554},
+    {"food_name": "Milk", "amount_g": 200, "usda_fdc_id": 100679},
+    {"food_name": "Banana", "amount_g": 120, "usda_fdc_id": 102289},
+]
+
+
+def scan_search(query: str, limit: int = 5) -> list:
+    """search_foods as a scan scoring every food, the reference for the common searches."""
+    query_lower = query.lower()
+    query_words = query_lower.split()
+    scored = []
+    for i, food in enumerate(lookup_usda.load_data()):
+        score = lookup_usda._score(query_lower, query_words, food["description"].lower())
+        if score is not None:
+            scored.append((-score, i, food))
+    scored.sort(key=lambda x: x[:2])
+    return [f for _, _, f in scored[:limit]]
+
+
+def slower_than_scan(results: list) -> list:
+    """(data, size) of each dataset where usda.search_common took longer than usda.search_scan."""
+    medians = {(r["name"], r["data"], r["size"]): r["median_s"] for r in results}
+    return [(data, size) for (name, data, size), median in medians.items()
+            if name == "usda.search_common" and median > medians.get(("usda.search_scan", data, size), median)]
+
+
+def run_script(module, *argv):
+    """Call a script's main() with the given arguments, discarding its output."""
+    saved = sys.argv
+    sys.argv = [module.__name__, *argv]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.main()
+    finally:
+        sys.argv = saved
+
+
+def own_peak_rss_kb():
+    """Peak resident memory (KB) of this process, or None where it can't be read.
+
+    Linux carries ru_maxrss over from the parent through fork and exec, so a
+    fresh child would report the harness's peak; VmHWM counts only its own.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # bytes on macOS
+
+
+def peak_rss_kb(kind: str, source: Path, work: Path, size: int, name: str):
+    """Peak resident memory (KB) of a fresh Python process running benchmark `name` once.
+
+    The child (run.py --peak-rss) sets the benchmarks up again on the same
+    `work` directory, so caches on disk are as warm as in this process but
+    memory holds only what the operation and its imports need, not this
+    harness's earlier runs. None if the child failed or can't tell.
+    """
+    child = subprocess.run([sys.executable, str(Path(__file__).resolve()), "--peak-rss",
+                            kind, str(source), str(work), str(size), name], stdout=subprocess.PIPE, text=True)
+    try:
+        return int(child.stdout.split()[-1]) if child.returncode == 0 else None
+    except (IndexError, ValueError):
+        return None
+
+
+def measure(name: str, size: int, op, repeat: int, reset=None, rss=None, data: str = "synthetic") -> dict:
+    """Time op() once after reset() (cold), then `repeat` more times (warm); rss() gives its peak RSS.
+
+    Garbage from earlier runs is collected before each run so it doesn't
+    land in the next one's timing.
+    """
+    if reset:
+        reset()
+    gc.collect()
+    start = time.perf_counter()
+    op()
+    cold = time.perf_counter() - start
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        op()
+        runs.append(time.perf_counter() - start)
+    runs = sorted(runs or [cold])
+    result = {"name": name, "data": data, "size": size, "cold_s": round(cold, 6),
+              "median_s": round(statistics.median(runs), 6),
+              "p95_s": round(runs[math.ceil(0.95 * len(runs)) - 1], 6),
+              "min_s": round(runs[0], 6), "runs": len(runs), "peak_rss_kb": rss() if rss else None}
+    rss = f"{result['peak_rss_kb'] / 1024:8.1f} MB" if result["peak_rss_kb"] else "       -"
+    print(f"  {name:28s} {size:>9d}  cold {cold * 1000:10.2f} ms  "
+          f"median {result['median_s'] * 1000:10.2f} ms  p95 {result['p95_s'] * 1000:10.2f} ms  "
+          f"rss {rss}", file=sys.stderr)
+    return result
+
+
+def dataset(cache: Path, kind: str, count: int, seed: int) -> Path:
+    """Path of a generated dataset, generating it unless `cache` already has it."""
+    if kind == "intake":
+        path = cache / f"intake-{count}-s{seed}.csv"
+        if not path.exists():
+            synthetic.write_intake(path, count, seed)
+    else:
+        path = cache / f"foods-{count}-s{seed}.json"
+        if not path.exists():
+            synthetic.write_usda(path, count, seed)
+    return path
+
+
+def use_usda(source: Path, work: Path):
+    """Point lookup_usda at `source`, compiled under `work` and answered in this process."""
+    work.mkdir(parents=True, exist_ok=True)
+    lookup_usda.DATA_FILE = source
+    lookup_usda.CACHE_DIR = work / "cache"
+    lookup_usda.SOCKET_PATH = work / "no-server.sock"  # never a running lookup server
+    lookup_usda.reset_cache()
+
+
+def intake_ops(source: Path, work: Path, rows: int) -> tuple:
+    """(reset, [(name, op)]) for the intake scripts on a copy of `source` in `work`.
+
+    The copy is made once: setting up again on the same `work` (the
+    --peak-rss child) carries on with the log as earlier runs left it.
+    """
+    work.mkdir(parents=True, exist_ok=True)
+    if not (work / "intake.csv").exists():
+        shutil.copy(source, work / "intake.csv")
+    intake_store.DATA_DIR = work  # the default profile's directory
+    use_usda(BUNDLED_USDA, work / "usda")  # templates are snapshotted from the bundled file
+
+    def reset():
+        shutil.rmtree(work / "cache", ignore_errors=True)
+        getattr(intake_store._local, "stores", {}).clear()
+
+    store = intake_store.open_store()
+    days = sorted(store.daily_totals())
+    day, first = days[-1], days[0]
+    week_start = (datetime.fromisoformat(day) - timedelta(days=6)).strftime("%Y-%m-%d")
+    middle = rows // 2
+    # Entries from the middle on are deleted in turn; runs in an earlier process may have started
+    undeleted = next((i for i in range(middle + 1, rows + 1) if store.get(i) is not None), rows + 1)
+    deletions = itertools.count(undeleted)
+    if TEMPLATE not in manage_templates.load_templates():
+        with contextlib.redirect_stdout(io.StringIO()):
+            manage_templates.add_template(TEMPLATE, [dict(food) for food in TEMPLATE_FOODS])
+
+    return reset, [
+        ("intake.rollup_rebuild", lambda: intake_store.open_store().rollups.rebuild()),
+        ("intake.entries_for_date", lambda: daily_summary.get_entries_for_date(day)),
+        ("intake.daily_summary", lambda: run_script(daily_summary, "--date", day, "--all")),
+        ("intake.weekly_summary", lambda: run_script(weekly_summary, "--start", week_start, "--end", day)),
+        ("intake.history_by_month", lambda: run_script(weekly_summary, "--start", first, "--end", day,
+                                                       "--by", "month")),
+        ("intake.search_food", lambda: run_script(search_entries, "--food", "salmon")),
+        ("intake.search_date", lambda: run_script(search_entries, "--date", day)),
+        ("intake.edit_entry", lambda: run_script(edit_entry, "--id", str(middle), "--field", "notes",
+                                                 "--value", "benchmark")),
+        ("intake.delete_entry", lambda: run_script(delete_entry, "--id", str(next(deletions)), "--confirm")),
+        ("intake.log_entry", lambda: log_entry.append_rows([log_entry.build_row(
+            "Benchmark snack", 50.0, overrides={"calories": 100}, timestamp=f"{day}T23:00:00")])),
+        ("intake.log_template", lambda: run_script(log_template, TEMPLATE, "--timestamp", f"{day}T08:00:00")),
+    ]
+
+
+def intake_benchmarks(source: Path, work: Path, rows: int, repeat: int) -> list:
+    """Benchmarks of the intake scripts on a copy of `source` in `work`."""
+    reset, ops = intake_ops(source, work, rows)
+    return [measure(name, rows, op, repeat, reset,
+                    lambda name=name: peak_rss_kb("intake", source, work, rows, name))
+            for name, op in ops]
+
+
+def usda_ops(source: Path, work: Path) -> list:
+    """[(name, op)] for the USDA lookups on `source`, compiled under `work`."""
+    use_usda(source, work)
+    all_ids = [fdc_id for (fdc_id,) in lookup_usda._store().execute("SELECT fdc_id FROM foods ORDER BY id")]
+    ids = all_ids[::max(1, len(all_ids) // 100)][:100]
+    return [
+        ("usda.build_store", lambda: lookup_usda.build_store(source)),
+        *((f"usda.search_{kind}", lambda queries=queries: [lookup_usda.search_foods(q, 5) for q in queries])
+          for kind, queries in SEARCHES.items()),
+        ("usda.search_scan", lambda: [scan_search(q) for q in SEARCHES["common"]]),
+        ("usda.lookup_script", lambda: run_script(lookup_usda, "chicken breast", "--json")),
+        ("usda.get_food", lambda: [lookup_usda.get_food(i) for i in ids[:20]]),
+        ("usda.get_foods", lambda: lookup_usda.get_foods(ids)),
+    ]
+
+
+def usda_benchmarks(source: Path, work: Path, foods: int, repeat: int, data: str = "synthetic") -> list:
+    """Benchmarks of the USDA lookups on `source`, compiled under `work`."""
+    use_usda(source, work)
+
+    def reset():
+        lookup_usda.reset_cache()
+
+    def cold_store():
+        reset()
+        shutil.rmtree(lookup_usda.CACHE_DIR, ignore_errors=True)
+
+    def rss(name):
+        return lambda: peak_rss_kb("usda", source, work, foods, name)
+
+    results = [measure("usda.build_store", foods, lambda: lookup_usda.build_store(source), 0, cold_store,
+                       rss("usda.build_store"), data)]
+    results += [measure(name, foods, op, repeat, reset, rss(name), data)
+                for name, op in usda_ops(source, work) if name != "usda.build_store"]
+    reset()
+    return results
+
+
+def run_once(kind: str, source: Path, work: Path, size: int, name: str):
+    """Set up like the benchmarks and run `name` once: the --peak-rss child."""
+    ops = intake_ops(source, work, size)[1] if kind == "intake" else usda_ops(source, work)
+    dict(ops)[name]()
+
+
+def run_suite(intake_sizes, usda_sizes, repeat: int = 5, seed: int = 0, data_dir: Path = None,
+              bundled: bool = False) -> dict:
+    """Run every benchmark at every size; returns the report ({"meta", "results"})."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = data_dir or Path(tmp) / "datasets"
+        cache.mkdir(parents=True, exist_ok=True)
+        for rows in intake_sizes:
+            print(f"intake: {rows} entries", file=sys.stderr)
+            source = dataset(cache, "intake", rows, seed)
+            results += intake_benchmarks(source, Path(tmp) / f"intake-{rows}", rows, repeat)
+        for foods in usda_sizes:
+            print(f"usda: {foods} foods", file=sys.stderr)
+            source = dataset(cache, "usda", foods, seed)
+            results += usda_benchmarks(source, Path(tmp) / f"usda-{foods}", foods, repeat)
+        if bundled:
+            if BUNDLED_USDA.exists():
+                foods = sum(1 for _ in lookup_usda.iter_foods(BUNDLED_USDA))
+                print(f"usda: bundled {BUNDLED_USDA.name} ({foods} foods)", file=sys.stderr)
+                results += usda_benchmarks(BUNDLED_USDA, Path(tmp) / "usda-bundled", foods, repeat, "bundled")
+            else:
+                print(f"usda: {BUNDLED_USDA} not found, skipping the bundled dataset", file=sys.stderr)
+    return {"meta": metadata(seed, repeat), "results": results}
+
+
+def metadata(seed: int, repeat: int) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": columnar.AVAILABLE,
+        "seed": seed,
+        "repeat": repeat,
+    }
+
+
+def sizes(text: str) -> list:
+    """Comma-separated counts like 1k,10k,1M; 'none' for no sizes."""
+    if text.strip().lower() == "none":
+        return []
+    try:
+        return [synthetic.size(part) for part in text.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected counts like 1k,10k,1M, got {text!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scripts on synthetic data")
+    parser.add_argument("--intake-sizes", type=sizes, default=INTAKE_SIZES,
+                        help="Intake entries to test with (default: 1k,10k,100k)")
+    parser.add_argument("--usda-sizes", type=sizes, default=USDA_SIZES,
+                        help="USDA foods to test with (default: 365,3k,30k)")
+    parser.add_argument("--full", action="store_true", help="Also test 1M entries and 300k foods")
+    parser.add_argument("--bundled", action="store_true", help="Also test lookups on the bundled USDA file")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm runs per benchmark (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated data")
+    parser.add_argument("--data-dir", type=Path,
+                        help="Keep generated datasets here and reuse them (default: a temporary directory)")
+    parser.add_argument("-o", "--output", type=str, default="-", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--peak-rss", nargs=5, metavar=("KIND", "SOURCE", "WORK", "SIZE", "NAME"),
+                        help=argparse.SUPPRESS)  # child process of peak_rss_kb
+    args = parser.parse_args()
+
+    if args.peak_rss:
+        kind, source, work, size, name = args.peak_rss
+        run_once(kind, Path(source), Path(work), int(size), name)
+        print(own_peak_rss_kb())
+        return
+
+    intake_sizes = args.intake_sizes + (FULL_INTAKE_SIZES if args.full else [])
+    usda_sizes = args.usda_sizes + (FULL_USDA_SIZES if args.full else [])
+
+    report = run_suite(intake_sizes, usda_sizes, args.repeat, args.seed, args.data_dir, args.bundled)
+    slow = slower_than_scan(report["results"])
+    report = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(report)
+    else:
+        Path(args.output).write_text(report + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    if slow:
+        print("FAIL: usda.search_common is slower than usda.search_scan on "
+              + ", ".join(f"{data} {size}" for data, size in slow), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
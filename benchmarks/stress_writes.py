@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Stress test for concurrent writes to the intake store.
+
+Forks worker processes that log, edit, delete and read entries in the same
+store at once (as parallel tool calls do), then checks that nothing was
+lost, duplicated or torn:
+
+- every entry a worker logged and didn't delete is there exactly once,
+  with that worker's last edit applied
+- entry IDs are unique
+- every read a worker made parsed into complete rows
+- the rollup cache matches the entries, before and after compaction
+- IDs of deleted entries aren't handed out again, even after compacting
+  away every entry
+
+Runs against a temporary directory, never data/.
+
+    python3 benchmarks/stress_writes.py --workers 16 --ops 50 --backend csv
+    python3 benchmarks/stress_writes.py --unlocked   # shows what goes wrong without locks
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import intake_store  # noqa: E402
+from intake_store import COLUMNS, entry_date  # noqa: E402
+
+BACKENDS = ("csv", "partitioned", "sqlite")
+
+
+def make_store(backend: str, root: Path):
+    if backend == "csv":
+        return intake_store.CsvStore(root / "intake.csv")
+    if backend == "partitioned":
+        return intake_store.PartitionedStore(root / "intake")
+    return intake_store.SqliteStore(root / "intake.db")
+
+
+def make_row(worker: int, n: int, rng: random.Random) -> dict:
+    day = date(2026, 1, 1) + timedelta(days=rng.randrange(90))
+    row = {c: "" for c in COLUMNS}
+    row.update(timestamp=f"{day}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+               food_name=f"w{worker}-{n}", amount_g="100", calories=str(rng.randrange(1, 800)),
+               protein_g=f"{rng.uniform(0, 40):.1f}")
+    return row
+
+
+def worker(args):
+    """Run `ops` random operations; returns (expected {food_name: row}, read errors)."""
+    backend, root, worker_id, ops, seed = args
+    store = make_store(backend, Path(root))
+    rng = random.Random(seed)
+    mine = {}  # entry id -> row as this worker last wrote it
+    read_errors = []
+    for n in range(ops):
+        try:
+            _step(store, rng, worker_id, n, mine, read_errors)
+        except Exception as e:
+            read_errors.append(f"worker {worker_id}: {type(e).__name__}: {e}")
+    return {row["food_name"]: row for row in mine.values()}, read_errors
+
+
+def _step(store, rng, worker_id: int, n: int, mine: dict, read_errors: list):
+    """One random operation by a worker."""
+    op = rng.random()
+    if op < 0.45 or not mine:
+        row = make_row(worker_id, n, rng)
+        entry_id = store.append([row])[0]
+        mine[entry_id] = row
+    elif op < 0.65:
+        entry_id = rng.choice(list(mine))
+        changes = {"calories": str(rng.randrange(1, 800))}
+        if rng.random() < 0.3:
+            changes["timestamp"] = make_row(worker_id, n, rng)["timestamp"]
+        if store.update(entry_id, changes) is None:
+            read_errors.append(f"update: entry {entry_id} not found")
+        else:
+            mine[entry_id] = {**mine[entry_id], **changes}
+    elif op < 0.8:
+        entry_id = rng.choice(list(mine))
+        if store.delete(entry_id) is None:
+            read_errors.append(f"delete: entry {entry_id} not found")
+        del mine[entry_id]
+    else:
+        start = (date(2026, 1, 1) + timedelta(days=rng.randrange(90))).isoformat()
+        for entry_id, row in store.entries(start, start):
+            if set(row) != set(COLUMNS) or entry_date(row["timestamp"]) != start:
+                read_errors.append(f"torn read: {entry_id} {row}")
+
+
+def check(store, expected: dict) -> list:
+    """Differences between the store and what the workers expect."""
+    problems = []
+    entries = list(store.entries())
+    ids = [entry_id for entry_id, _ in entries]
+    if len(ids) != len(set(ids)):
+        problems.append(f"{len(ids) - len(set(ids))} duplicate entry IDs")
+    found = {}
+    for _, row in entries:
+        if row["food_name"] in found:
+            problems.append(f"{row['food_name']} logged more than once")
+        found[row["food_name"]] = row
+    for name in expected.keys() - found.keys():
+        problems.append(f"lost: {name}")
+    for name in found.keys() - expected.keys():
+        problems.append(f"came back after delete: {name}")
+    for name in expected.keys() & found.keys():
+        if any(found[name][c] != expected[name][c] for c in ("timestamp", "calories")):
+            problems.append(f"edit lost: {name}")
+
+    totals = {}
+    for _, row in entries:
+        day = totals.setdefault(entry_date(row["timestamp"]), {"entries": 0, "calories": 0.0})
+        day["entries"] += 1
+        day["calories"] += float(row["calories"] or 0)
+    cached = store.daily_totals()
+    for day in totals.keys() | cached.keys():
+        want, got = totals.get(day), cached.get(day)
+        if not want or not got or want["entries"] != got["entries"] \
+                or abs(want["calories"] - got["calories"]) > 1e-6:
+            problems.append(f"rollup mismatch on {day}: {want} vs {got and {k: got[k] for k in want or got}}")
+    return problems
+
+
+def check_reuse(backend: str) -> list:
+    """Log two entries, delete both, compact, log again: the new entry must not reuse an old ID."""
+    with tempfile.TemporaryDirectory() as root:
+        store = make_store(backend, Path(root))
+        rng = random.Random(0)
+        used = store.append([make_row(0, n, rng) for n in range(2)])
+        for entry_id in used:
+            store.delete(entry_id)
+        if hasattr(store, "compact"):
+            store.compact()
+        entry_id = make_store(backend, Path(root)).append([make_row(0, 2, rng)])[0]
+        if entry_id <= max(used):
+            return [f"ID {entry_id} reused after deleting {used} and compacting"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent write stress test for the intake store")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent processes (default: 16)")
+    parser.add_argument("--ops", type=int, default=40, help="Operations per worker (default: 40)")
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="all")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--unlocked", action="store_true",
+                        help="Disable the advisory locks, to see the failures they prevent")
+    args = parser.parse_args()
+
+    if args.unlocked:
+        intake_store.fcntl = None
+
+    failed = False
+    for backend in BACKENDS if args.backend == "all" else (args.backend,):
+        with tempfile.TemporaryDirectory() as root:
+            jobs = [(backend, root, w, args.ops, args.seed * 1000 + w) for w in range(args.workers)]
+            with multiprocessing.get_context("fork").Pool(args.workers) as pool:
+                results = pool.map(worker, jobs)
+
+            expected, read_errors = {}, []
+            for mine, errors in results:
+                expected.update(mine)
+                read_errors.extend(errors)
+            store = make_store(backend, Path(root))
+            try:
+                problems = read_errors + check(store, expected)
+                if hasattr(store, "compact"):
+                    store.compact()
+                    problems += [f"after compaction: {p}" for p in check(make_store(backend, Path(root)), expected)]
+            except Exception as e:
+                problems = read_errors + [f"store unreadable: {type(e).__name__}: {e}"]
+            problems += check_reuse(backend)
+
+            ops = args.workers * args.ops
+            if problems:
+                failed = True
+                print(f"{backend:12s} FAIL  {ops} ops, {len(expected)} entries, {len(problems)} problems")
+                for problem in problems[:10]:
+                    print(f"    {problem}")
+            else:
+                print(f"{backend:12s} ok    {ops} ops, {len(expected)} entries")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Reproducible synthetic datasets for the benchmarks.
+
+- intake logs: every intake column, with the ID column by default, 0-9
+  entries a day per person clustered around meal times (some days
+  skipped, about 1% of entries back-dated as if logged late), 60% of
+  foods with a USDA FDC ID and full micronutrients, the rest with
+  hand-entered macros only; at most 20 years, with more people for
+  bigger logs
+- USDA FoundationFoods JSON: the same record shape as the FoodData Central
+  download (nutrient ids and numbers, unmapped nutrients, portions,
+  category), written one food at a time so large files need little memory
+
+The same seed and size always give the same bytes. FDC IDs are
+100000 + 7*i for the i-th food, so intake files reference foods that
+exist in any USDA file with more than i foods.
+
+    python3 benchmarks/synthetic.py intake --rows 100000 -o /tmp/intake.csv
+    python3 benchmarks/synthetic.py usda --foods 30000 -o /tmp/foods.json
+"""
+
+import argparse
+import csv
+import json
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from intake_store import COLUMNS, ID_COLUMN  # noqa: E402
+from lookup_usda import NUTRIENT_MAP  # noqa: E402
+
+# Last day of generated intake logs; fixed so files don't change from day to day
+END_DATE = date(2026, 1, 1)
+
+# How many USDA foods intake files draw FDC IDs from (the real Foundation Foods size)
+FDC_FOODS = 365
+
+# Longest history generated; bigger logs get more people's entries per day
+MAX_DAYS = 20 * 365
+
+# Mean entries per person per day from _day_times
+PER_DAY = 4.35
+
+FOODS = [
+    "Eggs", "Eggplant", "Chicken", "Beef", "Milk", "Cheese", "Apples", "Bananas", "Oats", "Rice",
+    "Bread", "Yogurt", "Salmon", "Tomatoes", "Potatoes", "Broccoli", "Spinach", "Almonds",
+    "Peanut butter", "Orange juice", "Cheddar", "Mozzarella", "Pork", "Turkey", "Lentils", "Beans",
+    "Carrots", "Onions", "Garlic", "Mushrooms", "Peppers", "Cucumber", "Lettuce", "Kale", "Quinoa",
+    "Pasta", "Tofu", "Tuna", "Shrimp", "Avocado", "Blueberries", "Strawberries", "Grapes",
+    "Pears", "Walnuts", "Cashews", "Chickpeas", "Butter", "Olive oil", "Honey", "Coffee", "Tea",
+]
+MODIFIERS = [
+    "raw", "cooked", "boiled", "Grade A", "large", "whole", "skinless", "boneless", "breast",
+    "fresh", "frozen", "canned", "dried", "roasted", "fried", "with salt", "without skin",
+    "nonfat", "2% milkfat", "unsweetened", "red", "green", "white", "brown", "meat only",
+    "steamed", "grilled", "sliced", "organic", "low sodium",
+]
+CATEGORIES = [
+    "Dairy and Egg Products", "Poultry Products", "Beef Products", "Fruits and Fruit Juices",
+    "Vegetables and Vegetable Products", "Legumes and Legume Products", "Nut and Seed Products",
+    "Cereal Grains and Pasta", "Finfish and Shellfish Products", "Fats and Oils", "Beverages",
+]
+# Nutrients in real records that the lookup doesn't map (parsed and skipped)
+UNMAPPED = [
+    ("Water", "g"), ("Ash", "g"), ("Nitrogen", "g"), ("Starch", "g"), ("Glucose", "g"),
+    ("Fructose", "g"), ("Lactose", "g"), ("Tryptophan", "g"), ("Threonine", "g"),
+    ("Isoleucine", "g"), ("Leucine", "g"), ("Lysine", "g"), ("Methionine", "g"),
+    ("Carotene, beta", "µg"), ("Lutein + zeaxanthin", "µg"), ("Choline, total", "mg"),
+]
+PORTION_UNITS = ["cup", "tbsp", "tsp", "oz", "slice", "piece", "serving", "undetermined"]
+MEALS = [(7.5, 1.0), (12.5, 1.0), (18.5, 1.2)]  # (hour, spread)
+
+
+def _unit(column: str) -> str:
+    for suffix, unit in (("_mcg", "µg"), ("_mg", "mg"), ("_g", "g")):
+        if column.endswith(suffix):
+            return unit
+    return "kcal" if column == "calories" else "g"
+
+
+def _profile(fdc_index: int) -> dict:
+    """Per-100g nutrient amounts for a food, the same for every file."""
+    rng = random.Random(fdc_index)
+    protein, carbs, fat = rng.uniform(0, 30), rng.uniform(0, 70), rng.uniform(0, 30)
+    profile = {"calories": 4 * protein + 4 * carbs + 9 * fat, "protein_g": protein,
+               "carbs_g": carbs, "fat_g": fat}
+    for column in dict.fromkeys(NUTRIENT_MAP.values()):
+        if column not in profile and rng.random() < 0.8:
+            profile[column] = rng.uniform(0, 200 if _unit(column) != "g" else 10)
+    return profile
+
+
+def _day_times(rng: random.Random, day: date) -> list:
+    """Sorted meal and snack times for one day."""
+    count = rng.choices(range(10), weights=[7, 3, 8, 15, 20, 18, 13, 8, 5, 3])[0]
+    hours = []
+    for i in range(count):
+        if i < len(MEALS) and rng.random() < 0.9:
+            hour, spread = MEALS[i]
+            hours.append(min(23.9, max(0.0, rng.gauss(hour, spread))))
+        else:
+            hours.append(rng.uniform(9, 23))
+    start = datetime.combine(day, datetime.min.time())
+    return sorted(start + timedelta(minutes=int(h * 60)) for h in hours)
+
+
+def intake_rows(rows: int, seed: int = 0, end: date = END_DATE):
+    """Yield `rows` intake rows (dicts keyed by COLUMNS) in logging order, ending about `end`.
+
+    Up to MAX_DAYS of one person's eating; longer logs interleave several
+    people's days, as a shared household log would.
+    """
+    rng = random.Random(seed)
+    people = max(1, -(-rows // int(PER_DAY * MAX_DAYS)))
+    days = max(1, round(rows / (PER_DAY * people)))
+    day = end - timedelta(days=days - 1)
+    names = [f"{food}, {rng.choice(MODIFIERS)}" for food in FOODS for _ in range(4)]
+    produced = 0
+    while produced < rows:
+        for ts in sorted(t for _ in range(people) for t in _day_times(rng, day)):
+            if produced == rows:
+                break
+            if rng.random() < 0.01:
+                ts -= timedelta(days=rng.randint(1, 5))  # logged late
+            amount = rng.choice([30, 50, 100, 120, 150, 200, 250, 330])
+            row = {c: "" for c in COLUMNS}
+            row.update(timestamp=ts.isoformat(timespec="seconds"), amount_g=amount)
+            if rng.random() < 0.6:
+                fdc_index = rng.randrange(FDC_FOODS)
+                row["usda_fdc_id"] = 100000 + 7 * fdc_index
+                row["food_name"] = names[fdc_index % len(names)]
+                for column, per_100g in _profile(fdc_index).items():
+                    if column in row:
+                        row[column] = round(per_100g * amount / 100, 3)
+            else:
+                row["food_name"] = rng.choice(names)
+                row["calories"] = rng.randint(20, 800)
+                row["protein_g"] = round(rng.uniform(0, 40), 1)
+                row["carbs_g"] = round(rng.uniform(0, 90), 1)
+                row["fat_g"] = round(rng.uniform(0, 35), 1)
+            if rng.random() < 0.1:
+                row["notes"] = rng.choice(["breakfast", "lunch", "dinner", "snack", "estimated", "restaurant"])
+            produced += 1
+            yield row
+        day += timedelta(days=1)
+
+
+def write_intake(path: Path, rows: int, seed: int = 0, ids: bool = True, end: date = END_DATE) -> Path:
+    """Write a synthetic intake CSV (with the ID column unless ids=False)."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[ID_COLUMN, *COLUMNS] if ids else COLUMNS)
+        writer.writeheader()
+        for n, row in enumerate(intake_rows(rows, seed, end), start=2):
+            writer.writerow({ID_COLUMN: n, **row} if ids else row)
+    return path
+
+
+def usda_food(index: int, rng: random.Random) -> dict:
+    """One FoundationFoods record shaped like the FoodData Central download."""
+    modifiers = rng.sample(MODIFIERS, rng.randint(1, 4))
+    nutrients = [
+        {"type": "FoodNutrient", "id": 2000000 + index * 64,
+         "nutrient": {"id": 1062, "number": "268", "name": "Energy", "rank": 300, "unitName": "kJ"},
+         "amount": 0.0},
+    ]
+    profile = _profile(index)
+    nutrients[0]["amount"] = round(profile["calories"] * 4.184, 2)
+    for number, (name, column) in enumerate(NUTRIENT_MAP.items(), start=1):
+        amount = profile.get(column)
+        if amount is None:
+            continue
+        unit = "kcal" if name == "Energy" else _unit(column)
+        nutrients.append({"type": "FoodNutrient", "id": 2000000 + index * 64 + number,
+                          "nutrient": {"id": 1000 + number, "number": str(200 + number), "name": name,
+                                       "rank": 100 * number, "unitName": unit},
+                          "dataPoints": rng.randint(1, 12), "amount": round(amount, 3)})
+    for number, (name, unit) in enumerate(UNMAPPED, start=len(NUTRIENT_MAP) + 1):
+        nutrients.append({"type": "FoodNutrient", "id": 2000000 + index * 64 + number,
+                          "nutrient": {"id": 1000 + number, "number": str(200 + number), "name": name,
+                                       "rank": 100 * number, "unitName": unit},
+                          "dataPoints": rng.randint(1, 12), "amount": round(rng.uniform(0, 50), 3),
+                          "min": 0.0, "max": 60.0, "median": 25.0})
+    portions = [{"id": 300000 + index * 8 + n, "value": 1.0,
+                 "measureUnit": {"id": 1000 + n, "name": rng.choice(PORTION_UNITS), "abbreviation": "undetermined"},
+                 "modifier": "", "portionDescription": rng.choice(["", "1 large", "1 cup, chopped", "1 serving"]),
+                 "gramWeight": round(rng.uniform(5, 300), 1), "sequenceNumber": n + 1}
+                for n in range(rng.randint(0, 4))]
+    return {
+        "foodClass": "FinalFood",
+        "description": f"{FOODS[index % len(FOODS)]}, {', '.join(modifiers)}",
+        "foodNutrients": nutrients,
+        "foodAttributes": [],
+        "nutrientConversionFactors": [{"type": ".CalorieConversionFactor", "proteinValue": 4.0,
+                                       "fatValue": 9.0, "carbohydrateValue": 4.0}],
+        "isHistoricalReference": False,
+        "ndbNumber": 10000 + index,
+        "dataType": "Foundation",
+        "foodCategory": {"description": CATEGORIES[index % len(CATEGORIES)]},
+        "fdcId": 100000 + 7 * index,
+        "foodPortions": portions,
+        "publicationDate": "12/18/2025",
+        "inputFoods": [],
+    }
+
+
+def write_usda(path: Path, foods: int, seed: int = 0) -> Path:
+    """Write a synthetic FoundationFoods JSON file with `foods` records."""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write('{"FoundationFoods": [')
+        for index in range(foods):
+            if index:
+                f.write(", ")
+            json.dump(usda_food(index, rng), f)
+        f.write("]}\n")
+    return path
+
+
+def size(text: str) -> int:
+    """Parse a count like 5000, 10k or 1M."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic intake logs and USDA datasets")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    intake = sub.add_parser("intake", help="Synthetic intake.csv")
+    intake.add_argument("--rows", type=size, default=10_000, help="Entries (e.g. 1k, 1M; default 10k)")
+    intake.add_argument("--no-ids", action="store_true", help="Leave out the id column (pre-ID file)")
+    usda = sub.add_parser("usda", help="Synthetic FoundationFoods JSON")
+    usda.add_argument("--foods", type=size, default=FDC_FOODS, help=f"Foods (default {FDC_FOODS})")
+    for p in (intake, usda):
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("-o", "--output", type=Path, required=True, help="File to write")
+    args = parser.parse_args()
+
+    if args.kind == "intake":
+        write_intake(args.output, args.rows, args.seed, ids=not args.no_ids)
+        print(f"Wrote {args.rows} entries to {args.output}")
+    else:
+        write_usda(args.output, args.foods, args.seed)
+        print(f"Wrote {args.foods} foods to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
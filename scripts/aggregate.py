@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Nutrient aggregation shared by the summary scripts.
+
+Per-day totals come from the intake store's rollup cache, which costs at
+most one pass over the log; aggregate() then groups them by day, ISO week
+or month for any date range.
+"""
+
+import csv
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import tracing
+from intake_store import NUTRIENT_COLUMNS, open_store, profile_dir
+
+TARGETS_FILE = Path(__file__).parent.parent / "data" / "targets.csv"
+
+GROUPINGS = ("day", "week", "month")
+
+
+def targets_file(profile: str = None) -> Path:
+    """The profile's targets.csv, or the shared data/targets.csv if it has none"""
+    path = profile_dir(profile) / TARGETS_FILE.name
+    return path if path.exists() else TARGETS_FILE
+
+
+def load_targets(profile: str = None):
+    """Load daily targets from the profile's targets.csv"""
+    targets = {}
+    path = targets_file(profile)
+    if path.exists():
+        with open(path, "r") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                targets[row["nutrient"]] = float(row["daily_target"])
+    return targets
+
+
+def sum_nutrients(entries, fields):
+    """Sum nutrient values across entries"""
+    totals = {field: 0 for field in fields}
+    for entry in entries:
+        for field in fields:
+            val = entry.get(field, "")
+            if val and val.strip():
+                try:
+                    totals[field] += float(val)
+                except ValueError:
+                    pass
+    return totals
+
+
+def last_days(days: int, end: datetime = None):
+    """(start, end) date strings for the `days` days ending today (or `end`)"""
+    end = end or datetime.now()
+    start = end - timedelta(days=days - 1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def period_of(date_str: str, by: str) -> str:
+    """Group key for a date: the date itself, ISO week (2026-W42) or month (2026-10)"""
+    if by == "month":
+        return date_str[:7]
+    if by == "week":
+        try:
+            year, week, _ = date.fromisoformat(date_str).isocalendar()
+        except ValueError:
+            return date_str
+        return f"{year}-W{week:02d}"
+    return date_str
+
+
+@tracing.traced("aggregate")
+def aggregate(start: str = None, end: str = None, by: str = "day", fields=None, store=None) -> dict:
+    """Nutrient totals per period for entries dated start..end (inclusive).
+
+    Returns {period: {"days": days with entries, "entries": n, field: total}}
+    in chronological order; periods without entries are left out.
+    """
+    if by not in GROUPINGS:
+        raise ValueError(f"Unknown grouping '{by}' (expected one of {', '.join(GROUPINGS)})")
+    fields = fields or NUTRIENT_COLUMNS
+    daily = (store or open_store()).daily_totals(start, end)
+
+    groups = {}
+    for date_str in sorted(daily):
+        day = daily[date_str]
+        group = groups.setdefault(period_of(date_str, by),
+                                  {"days": 0, "entries": 0, **{f: 0.0 for f in fields}})
+        group["days"] += 1
+        group["entries"] += day["entries"]
+        for field in fields:
+            group[field] += day.get(field, 0)
+    tracing.note(by=by, days=len(daily), periods=len(groups))
+    return groups
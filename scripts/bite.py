@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""One entry point for every script, plus a session mode that stays warm between commands.
+
+    python3 scripts/bite.py log --food "Banana" --amount 120
+    python3 scripts/bite.py daily --all
+    python3 scripts/bite.py session < commands.txt
+
+Subcommands take the same arguments as their scripts (bite.py COMMAND
+--help); the full script names (log_entry, daily_summary, ...) work too.
+
+`session` reads one command per line from stdin and runs each in this
+process, so the interpreter starts, modules import and the USDA dataset,
+its indexes and the intake caches load once instead of once per command.
+A line is either a command as it would follow bite.py, quoted like a
+shell command:
+
+    search --food "greek yogurt" --limit 3
+
+which prints its output as usual (then "[exit N]" if it failed), or a
+JSON request, answered with one JSON line:
+
+    {"id": 1, "command": "log", "args": ["--food", "Banana", "--amount", "120"]}
+    {"id": 1, "status": 0, "stdout": "Logged: Banana (120.0g) ...\\n", "stderr": ""}
+
+"status" is the exit code the script would have returned and "id" is
+echoed back; "stdin" in a request is what `--batch -` or `import -` read.
+With --json plain lines get JSON answers too. Blank lines and lines
+starting with # are skipped, and "exit" ends the session. Changes made
+by other processes meanwhile are seen: the intake stores check their
+files before trusting their caches, and a changed USDA file is reloaded.
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import shlex
+import sys
+import traceback
+
+import tracing
+from intake_store import add_profile_argument
+from tracing import add_trace_argument, start_tracing
+
+# Subcommand: (script module, what it does)
+COMMANDS = {
+    "log": ("log_entry", "Log foods"),
+    "lookup": ("lookup_usda", "Search the USDA database"),
+    "search": ("search_entries", "Search logged entries"),
+    "edit": ("edit_entry", "Edit an entry"),
+    "delete": ("delete_entry", "Delete an entry"),
+    "daily": ("daily_summary", "Daily totals against targets"),
+    "weekly": ("weekly_summary", "Averages and trends over a range of days"),
+    "template": ("log_template", "Log a meal template"),
+    "templates": ("manage_templates", "Manage meal templates"),
+    "import": ("import_entries", "Import another tracker's history"),
+    "store": ("intake_store", "Manage intake storage and profiles"),
+    "server": ("lookup_server", "Run the resident USDA lookup server"),
+    "trace": ("tracing", "Show spans recorded with --trace"),
+}
+
+# Scripts that run until stopped, so not inside a session
+NOT_IN_SESSION = {"lookup_server"}
+
+
+def script_for(name: str):
+    """Module name behind a subcommand or script name, or None."""
+    if name in COMMANDS:
+        return COMMANDS[name][0]
+    if any(module == name for module, _ in COMMANDS.values()):
+        return name
+    return None
+
+
+def run(argv: list, in_session: bool = False) -> int:
+    """Run one command (["daily", "--all"]) in this process; returns its exit status.
+
+    In a session, errors are reported on stderr instead of ending the
+    process.
+    """
+    name, *args = argv
+    module = script_for(name)
+    if module is None:
+        print(f"Error: unknown command '{name}' (commands: {', '.join(COMMANDS)})")
+        return 2
+    if in_session and module in NOT_IN_SESSION:
+        print(f"Error: '{name}' runs until stopped, so it can't run in a session")
+        return 2
+
+    saved = sys.argv
+    sys.argv = [f"bite.py {name}", *args]  # usage messages show the subcommand
+    try:
+        with tracing.span(module, argv=args):
+            importlib.import_module(module).main()
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        if not in_session:
+            raise
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = saved
+    return 0
+
+
+class Session:
+    """Answers commands read from stdin, one at a time, in this process."""
+
+    def __init__(self, as_json: bool = False):
+        self.as_json = as_json
+        self.usda_stamp = None
+
+    def refresh(self):
+        """Reload the USDA dataset if its file changed since it was loaded (as lookup_server does)."""
+        lookup_usda = sys.modules.get("lookup_usda")
+        if lookup_usda is None or lookup_usda._store_conn is None:
+            return
+        stamp = lookup_usda._source_stamp(lookup_usda.DATA_FILE)
+        if self.usda_stamp is not None and stamp != self.usda_stamp:
+            lookup_usda.reset_cache()
+        self.usda_stamp = stamp
+
+    def capture(self, argv: list, stdin: str = "") -> dict:
+        """Run a command with its output captured."""
+        out, err = io.StringIO(), io.StringIO()
+        saved = sys.stdin
+        sys.stdin = io.StringIO(stdin)
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                status = run(argv, in_session=True)
+        finally:
+            sys.stdin = saved
+        return {"status": status, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+    @staticmethod
+    def from_request(request) -> tuple:
+        """(argv, stdin) for a JSON request; raises ValueError if it isn't a valid one."""
+        if not isinstance(request, dict) or not isinstance(request.get("command"), str):
+            raise ValueError('expected {"command": str, "args": [str, ...]}')
+        args = request.get("args", [])
+        stdin = request.get("stdin") or ""
+        if not isinstance(args, list) or not isinstance(stdin, str):
+            raise ValueError('"args" must be a list and "stdin" a string')
+        return [request["command"], *map(str, args)], stdin
+
+    def answer(self, line: str) -> bool:
+        """Run one line and print the answer; False once the session should end."""
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return True
+        if line in ("exit", "quit"):
+            return False
+        as_json = self.as_json or line.startswith("{")
+        request_id = None
+        try:
+            if line.startswith("{"):
+                request = json.loads(line)
+                request_id = request.get("id") if isinstance(request, dict) else None
+                argv, stdin = self.from_request(request)
+            else:
+                argv, stdin = shlex.split(line), ""
+        except ValueError as e:
+            error = f"Error: invalid command ({e})"
+            print(json.dumps({"id": request_id, "status": 2, "stdout": "", "stderr": error}) if as_json else error,
+                  flush=True)
+            return True
+        if not argv:
+            return True
+
+        self.refresh()
+        if as_json:
+            print(json.dumps({"id": request_id, **self.capture(argv, stdin)}), flush=True)
+        else:
+            saved = sys.stdin
+            sys.stdin = io.StringIO()  # the session's stdin holds the next commands
+            try:
+                status = run(argv, in_session=True)
+            finally:
+                sys.stdin = saved
+            if status:
+                print(f"[exit {status}]")
+            sys.stdout.flush()
+            sys.stderr.flush()
+        return True
+
+    def serve(self, lines):
+        for line in lines:
+            if not self.answer(line):
+                break
+
+
+def _prompted():
+    """Lines typed at a terminal, with a prompt."""
+    while True:
+        try:
+            yield input("bite> ")
+        except EOFError:
+            print()
+            return
+
+
+def session(argv: list):
+    parser = argparse.ArgumentParser(prog="bite.py session",
+                                     description="Run commands from stdin in one warm process")
+    parser.add_argument("--json", action="store_true", help="Answer every command with a JSON line")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
+
+    args = parser.parse_args(argv)
+    if args.profile:
+        os.environ["BITE_PROFILE"] = args.profile  # commands without --profile use it
+    start_tracing(args.trace, "bite")
+
+    Session(args.json).serve(_prompted() if sys.stdin.isatty() else sys.stdin)
+
+
+def usage() -> str:
+    width = max(map(len, COMMANDS))
+    lines = [f"  {name:{width}s}  {description} ({module}.py)" for name, (module, description) in COMMANDS.items()]
+    return "\n".join([
+        "usage: bite.py COMMAND [ARGS ...]",
+        "",
+        "Run a script's operation; ARGS are the script's own (bite.py COMMAND --help).",
+        "",
+        "commands:",
+        *lines,
+        f"  {'session':{width}s}  Read commands from stdin and run them in this process (--json, --profile)",
+    ])
+
+
+def main():
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    if argv[0] == "session":
+        session(argv[1:])
+        return
+    sys.exit(run(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Vectorized nutrient analytics with NumPy (optional).
+
+Long-range reports load the intake log as a float matrix (entries x
+nutrient columns, NaN for blank or unreadable cells) with a matching date
+index, then compute daily totals, averages, target percentages and trends
+with array ops instead of per-entry, per-field loops.
+
+Converting the entries' strings is the expensive part, so the matrix is
+kept sorted by date in data/cache/ (columnar-<store>.npz) with the store's
+stamp, like the rollup cache: it is rebuilt with one pass over the log
+when the log changed, and a date range is then two binary searches and a
+slice.
+
+NumPy is optional: AVAILABLE is False when it isn't installed and callers
+use the pure-Python code in weekly_summary.py instead.
+"""
+
+import os
+
+import tracing
+from intake_store import NUTRIENT_COLUMNS, entry_date, open_store
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+AVAILABLE = np is not None
+
+
+def _require():
+    if np is None:
+        raise RuntimeError("NumPy is not installed (pip install numpy)")
+
+
+def _floats(cells: list):
+    """Float array from CSV cells; blanks and junk become NaN."""
+    try:
+        return np.array([c or "nan" for c in cells], dtype=float)
+    except (TypeError, ValueError):
+        pass
+    values = np.full(len(cells), np.nan)
+    for i, cell in enumerate(cells):
+        try:
+            values[i] = float(cell)
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+@tracing.traced("columnar.build")
+def _build(store, path, stamp: str):
+    """Parse every entry into (dates, matrix), sorted by date, and save it with `stamp`."""
+    dates, cells = [], []
+    for _, row in store.entries():
+        dates.append(entry_date(row.get("timestamp") or ""))
+        cells.extend(row.get(c) for c in NUTRIENT_COLUMNS)
+    dates = np.array(dates, dtype="U10")
+    matrix = _floats(cells).reshape(len(dates), len(NUTRIENT_COLUMNS))
+    order = np.argsort(dates, kind="stable")
+    dates, matrix = dates[order], matrix[order]
+    tracing.note(rows=len(dates))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp, stamp=np.array(stamp), dates=dates, matrix=matrix)
+    os.replace(tmp, path)  # readers see the old cache or the new one, never half
+    return dates, matrix
+
+
+def _cached(store):
+    """(dates, matrix) for the whole log, from the cache or rebuilt if the log changed."""
+    path = store.cache_dir / f"columnar-{store.cache_key}.npz"
+    stamp = store.stamp()
+    try:
+        with np.load(path) as cache:
+            if str(cache["stamp"]) == stamp:
+                return cache["dates"], cache["matrix"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return _build(store, path, stamp)
+
+
+@tracing.traced("columnar.load")
+def load_matrix(start: str = None, end: str = None, fields=NUTRIENT_COLUMNS, store=None):
+    """(dates, matrix) for the entries dated start..end, in date order: one row per entry, one column per field."""
+    _require()
+    dates, matrix = _cached(store or open_store())
+    lo = np.searchsorted(dates, start, side="left") if start else 0
+    hi = np.searchsorted(dates, end, side="right") if end else len(dates)
+    columns = [NUTRIENT_COLUMNS.index(f) for f in fields]
+    tracing.note(rows=int(hi - lo))
+    return dates[lo:hi], matrix[lo:hi][:, columns]
+
+
+def daily_totals(dates, matrix):
+    """(days, totals): each date in `dates` (sorted) once, with its column sums; blanks count as 0.
+
+    Totals are rounded to 6 decimals, as in the rollup cache.
+    """
+    _require()
+    if not len(dates):
+        return dates, np.zeros((0, matrix.shape[1]))
+    days, first = np.unique(dates, return_index=True)
+    totals = np.add.reduceat(np.nan_to_num(matrix, nan=0.0), first, axis=0)
+    return days, np.round(totals, 6)
+
+
+def averages(totals):
+    """Mean per column over the days in the matrix (0 when there are none)."""
+    _require()
+    if not len(totals):
+        return np.zeros(totals.shape[1])
+    return totals.mean(axis=0)
+
+
+def target_percentages(means, targets):
+    """Each column's mean as a percentage of its target; NaN where the target is 0."""
+    _require()
+    targets = np.asarray(targets, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(targets > 0, means / targets * 100, np.nan)
+
+
+def trends(totals) -> list:
+    """Trend label per column, comparing the first half of the days to the second."""
+    _require()
+    if len(totals) < 3:
+        return ["insufficient data"] * totals.shape[1]
+
+    mid = len(totals) // 2
+    first = totals[:mid].mean(axis=0)
+    second = totals[mid:].mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (second - first) / first * 100
+
+    labels = []
+    for f, c in zip(first.tolist(), change.tolist()):
+        if f == 0:
+            labels.append("stable")
+        elif c > 10:
+            labels.append(f"increasing (+{c:.0f}%)")
+        elif c < -10:
+            labels.append(f"decreasing ({c:.0f}%)")
+        else:
+            labels.append("stable")
+    return labels
@@ -2,49 +2,19 @@
 """Get daily nutritional summary from intake.csv"""
 
 import argparse
-import csv
 from datetime import datetime, timedelta
-from pathlib import Path
 
-DATA_FILE = Path(__file__).parent.parent / "data" / "intake.csv"
-TARGETS_FILE = Path(__file__).parent.parent / "data" / "targets.csv"
+from aggregate import aggregate, load_targets, sum_nutrients
+from intake_store import add_profile_argument, open_store, use_profile
+from tracing import add_trace_argument, start_tracing
 
 MACRO_FIELDS = ["calories", "protein_g", "carbs_g", "fiber_g", "sugar_g", "fat_g"]
 MINERAL_FIELDS = ["sodium_mg", "potassium_mg", "calcium_mg", "iron_mg", "magnesium_mg", "zinc_mg"]
 VITAMIN_FIELDS = ["vitamin_a_mcg", "vitamin_c_mg", "vitamin_d_mcg", "vitamin_b12_mcg"]
 
-def load_targets():
-    """Load daily targets from targets.csv"""
-    targets = {}
-    if TARGETS_FILE.exists():
-        with open(TARGETS_FILE, "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                targets[row["nutrient"]] = float(row["daily_target"])
-    return targets
-
 def get_entries_for_date(date_str):
-    """Get all entries for a specific date"""
-    entries = []
-    with open(DATA_FILE, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row["timestamp"].startswith(date_str):
-                entries.append(row)
-    return entries
-
-def sum_nutrients(entries, fields):
-    """Sum nutrient values across entries"""
-    totals = {field: 0 for field in fields}
-    for entry in entries:
-        for field in fields:
-            val = entry.get(field, "")
-            if val and val.strip():
-                try:
-                    totals[field] += float(val)
-                except ValueError:
-                    pass
-    return totals
+    """Get all entries for a date, or every date starting with date_str (e.g. 2026-01)"""
+    return [row for _, row in open_store().entries(date_str, date_str + "\uffff")]
 
 def format_pct(value, target):
     """Format as percentage of target"""
@@ -58,8 +28,12 @@ def main():
     parser.add_argument("--date", type=str, help="Date (YYYY-MM-DD), default today")
     parser.add_argument("--range", type=int, help="Show last N days")
     parser.add_argument("--all", action="store_true", help="Show all nutrients, not just macros")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
     targets = load_targets()
 
@@ -74,12 +48,12 @@ def main():
         print(f"Last {args.range} days:\n")
         all_totals = {field: 0 for field in MACRO_FIELDS}
         days_with_data = 0
+        daily_totals = aggregate(dates[0], dates[-1], "day", MACRO_FIELDS)
 
         for date_str in dates:
-            entries = get_entries_for_date(date_str)
-            if entries:
+            totals = daily_totals.get(date_str)
+            if totals:
                 days_with_data += 1
-                totals = sum_nutrients(entries, MACRO_FIELDS)
                 for field in MACRO_FIELDS:
                     all_totals[field] += totals[field]
                 print(f"{date_str}: {totals['calories']:.0f} cal, {totals['protein_g']:.0f}g protein, {totals['carbs_g']:.0f}g carbs, {totals['fat_g']:.0f}g fat")
@@ -2,39 +2,31 @@
 """Delete an entry from intake.csv"""
 
 import argparse
-import csv
-from pathlib import Path
 
-DATA_FILE = Path(__file__).parent.parent / "data" / "intake.csv"
+from intake_store import add_profile_argument, open_store, use_profile
+from tracing import add_trace_argument, start_tracing
 
 def main():
     parser = argparse.ArgumentParser(description="Delete intake entry")
     parser.add_argument("--id", type=int, required=True, help="Row ID to delete")
     parser.add_argument("--confirm", action="store_true", help="Skip confirmation")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
-    if not DATA_FILE.exists():
+    store = open_store()
+    if not store.exists():
         print("No intake data file found")
         return
 
-    # Read all data
-    rows = []
-    fieldnames = []
-    with open(DATA_FILE, "r") as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for row in reader:
-            rows.append(row)
-
-    # Find the row (ID is 1-indexed with header as row 1)
-    row_index = args.id - 2  # Convert to 0-indexed, accounting for header
-
-    if row_index < 0 or row_index >= len(rows):
+    to_delete = store.get(args.id)
+    if to_delete is None:
         print(f"Error: Row ID {args.id} not found")
         return
 
-    to_delete = rows[row_index]
     food_name = to_delete.get("food_name", "entry")
     amount = to_delete.get("amount_g", "?")
     timestamp = to_delete.get("timestamp", "?")
@@ -44,13 +36,7 @@ def main():
         print("Run with --confirm to execute deletion")
         return
 
-    # Delete and write back
-    del rows[row_index]
-
-    with open(DATA_FILE, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    store.delete(args.id)
 
     print(f"Deleted: {food_name} ({amount}g) logged at {timestamp}")
 
@@ -2,13 +2,10 @@
 """Edit an entry in intake.csv"""
 
 import argparse
-import csv
-import json
-import subprocess
-from pathlib import Path
 
-DATA_FILE = Path(__file__).parent.parent / "data" / "intake.csv"
-LOOKUP_SCRIPT = Path(__file__).parent / "lookup_usda.py"
+import nutrition
+from intake_store import add_profile_argument, open_store, use_profile
+from tracing import add_trace_argument, start_tracing
 
 # Nutrient columns that can be recalculated from USDA data
 NUTRIENT_COLS = [
@@ -24,15 +21,7 @@ NUTRIENT_COLS = [
 
 def lookup_usda(fdc_id: int) -> dict:
     """Look up USDA data by FDC ID, returns per-100g values."""
-    result = subprocess.run(
-        ["python3", str(LOOKUP_SCRIPT), "--id", str(fdc_id), "--json"],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        return None
-    data = json.loads(result.stdout)
-    return data[0] if data else None
+    return nutrition.get_by_id(fdc_id)
 
 
 def recalculate_nutrients(row: dict, new_amount: float) -> dict:
@@ -67,38 +56,34 @@ def main():
     parser.add_argument("--value", type=str, required=True, help="New value")
     parser.add_argument("--recalculate", action="store_true",
                         help="Recalculate nutrients when amount changes (requires usda_fdc_id)")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
-    if not DATA_FILE.exists():
+    store = open_store()
+    if not store.exists():
         print("No intake data file found")
         return
 
-    # Read all data
-    rows = []
-    fieldnames = []
-    with open(DATA_FILE, "r") as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for row in reader:
-            rows.append(row)
-
+    fieldnames = store.fieldnames
     if args.field not in fieldnames:
         print(f"Error: Unknown field '{args.field}'")
         print(f"Valid fields: {', '.join(fieldnames)}")
         return
 
-    # Find the row (ID is 1-indexed with header as row 1)
-    row_index = args.id - 2  # Convert to 0-indexed, accounting for header
-
-    if row_index < 0 or row_index >= len(rows):
+    row = store.get(args.id)
+    if row is None:
         print(f"Error: Row ID {args.id} not found")
         return
 
-    old_value = rows[row_index].get(args.field, "")
-    rows[row_index][args.field] = args.value
+    old_value = row.get(args.field, "")
+    row[args.field] = args.value
+    changes = {args.field: args.value}
 
-    food_name = rows[row_index].get("food_name", "entry")
+    food_name = row.get("food_name", "entry")
     print(f"Updated {food_name}:")
     print(f"  {args.field}: {old_value} -> {args.value}")
 
@@ -106,16 +91,16 @@ def main():
     if args.recalculate and args.field == "amount_g":
         try:
             new_amount = float(args.value)
-            updates = recalculate_nutrients(rows[row_index], new_amount)
+            updates = recalculate_nutrients(row, new_amount)
             if updates:
                 for col, val in updates.items():
-                    old_val = rows[row_index].get(col, "")
-                    rows[row_index][col] = val
+                    old_val = row.get(col, "")
+                    changes[col] = val
                     if old_val:
                         print(f"  {col}: {old_val} -> {val}")
                 print(f"  (Recalculated {len(updates)} nutrients from USDA data)")
             else:
-                fdc_id = rows[row_index].get("usda_fdc_id")
+                fdc_id = row.get("usda_fdc_id")
                 if not fdc_id:
                     print("  Warning: No usda_fdc_id - cannot recalculate nutrients")
                 else:
@@ -127,11 +112,7 @@ def main():
         print("  Note: --recalculate only works when editing amount_g")
 
     # Write back
-    with open(DATA_FILE, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
+    store.update(args.id, changes)
 
 if __name__ == "__main__":
     main()
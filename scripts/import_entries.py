@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Import food history from another tracker's CSV or JSON lines export.
+
+Records are streamed and written to the intake store in chunks, so only
+one chunk is held in memory however long the history is. Columns are
+matched to the intake schema by name (intake columns, log_entry.py's
+short nutrient names and a few common aliases such as "date", "food" or
+"kcal"); --map covers the rest. An id column in the export is ignored:
+entries get new IDs.
+
+Entries already in the log (or earlier in the same file) with the same
+timestamp, food name and amount are skipped, so re-running an import is
+safe; each chunk is checked against the log's entries for the days it
+covers only, so the history is never loaded as a whole. With --resolve,
+foods without an FDC ID are matched to their best USDA search result, a
+chunk of names per lookup, and blank nutrient columns are filled from it.
+Only exact and whole-word matches count: foods whose best result is a
+partial or fuzzy match are left unresolved and listed in the report.
+
+    python3 scripts/import_entries.py old_log.csv --map "Meal Item=food_name" --resolve
+    python3 scripts/import_entries.py export.jsonl --dry-run
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+import nutrition
+from intake_store import COLUMNS, NUTRIENT_COLUMNS, add_profile_argument, entry_date, open_store, use_profile
+from log_entry import ARG_TO_CSV, scale_nutrients
+from lookup_usda import word_match
+from tracing import add_trace_argument, start_tracing
+
+FORMATS = ("csv", "jsonl")
+
+# --batch item keys and header names other trackers use, normalized (see _normalize)
+ALIASES = {
+    "date": "timestamp", "datetime": "timestamp", "logged_at": "timestamp",
+    "food": "food_name", "name": "food_name", "food_item": "food_name", "item": "food_name",
+    "description": "food_name",
+    "amount": "amount_g", "grams": "amount_g", "weight_g": "amount_g", "quantity_g": "amount_g",
+    "kcal": "calories", "energy_kcal": "calories", "energy": "calories",
+    "usda_id": "usda_fdc_id", "fdc_id": "usda_fdc_id", "fdcid": "usda_fdc_id",
+    "note": "notes", "comment": "notes",
+}
+
+# How many invalid records to describe before only counting them
+MAX_ERRORS = 10
+
+
+def _normalize(name: str) -> str:
+    return name.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def column_for(name: str, mapping: dict = None):
+    """Intake column for a source column name, or None to ignore it."""
+    if mapping and name in mapping:
+        return mapping[name]
+    key = _normalize(name)
+    if key in COLUMNS:
+        return key
+    return ARG_TO_CSV.get(key) or ALIASES.get(key)
+
+
+def read_records(path: str, fmt: str):
+    """Yield (line number, {column: value}) from a CSV or JSON lines file ('-' for stdin)."""
+    f = sys.stdin if path == "-" else open(path, "r", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_num, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        record = e
+                    yield line_num, record
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def to_row(record, mapping: dict = None) -> dict:
+    """Intake row from a source record, raising ValueError if it can't be logged."""
+    if isinstance(record, Exception):
+        raise ValueError(f"invalid JSON ({record})")
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    row = {col: "" for col in COLUMNS}
+    for name, value in record.items():
+        col = column_for(name, mapping) if name is not None else None
+        if col and value is not None and str(value).strip():
+            row[col] = str(value).strip()
+
+    if not row["food_name"]:
+        raise ValueError("missing food name")
+    if not row["timestamp"]:
+        raise ValueError("missing timestamp")
+    try:
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"]).isoformat(timespec="seconds")
+    except ValueError:
+        raise ValueError(f"invalid timestamp {row['timestamp']!r}")
+    for col in ("amount_g", *NUTRIENT_COLUMNS):
+        if row[col]:
+            try:
+                float(row[col])
+            except ValueError:
+                raise ValueError(f"{col} must be a number, got {row[col]!r}")
+    if row["usda_fdc_id"]:
+        try:
+            row["usda_fdc_id"] = str(int(float(row["usda_fdc_id"])))
+        except ValueError:
+            raise ValueError(f"usda_fdc_id must be an integer, got {row['usda_fdc_id']!r}")
+    return row
+
+
+def entry_key(row: dict) -> tuple:
+    """What makes two entries the same meal: timestamp, food name and amount."""
+    amount = str(row.get("amount_g") or "").strip()
+    try:
+        amount = float(amount)
+    except ValueError:
+        pass
+    return str(row.get("timestamp") or "")[:19], str(row.get("food_name") or "").strip().lower(), amount
+
+
+def logged_keys(store, rows: list) -> set:
+    """entry_key()s of the logged entries on the days `rows` span (one date-bounded read)."""
+    if not rows or not store.exists():
+        return set()
+    dates = [entry_date(row["timestamp"]) for row in rows]
+    return {entry_key(row) for _, row in store.entries(min(dates), max(dates))}
+
+
+def resolve(rows: list, matches: dict) -> tuple:
+    """Fill FDC IDs and blank nutrients from USDA for a chunk of rows.
+
+    Returns how many rows were resolved and the food names of rows left
+    unresolved because their best search result isn't an exact or
+    whole-word match (see lookup_usda.word_match). Names are looked up once
+    for the chunk (and remembered in `matches` for later chunks); rows that
+    already have an FDC ID use it.
+    """
+    names = {row["food_name"] for row in rows if not row["usda_fdc_id"]} - matches.keys()
+    ids = {int(row["usda_fdc_id"]) for row in rows if row["usda_fdc_id"]}
+    try:
+        for name, record in nutrition.search_many(sorted(names)).items():
+            matches[name] = record if record and word_match(name, record["food_name"]) else None
+        records = nutrition.get_many(sorted(ids))
+    except Exception as e:
+        print(f"Warning: USDA lookup failed: {e}")
+        return 0, []
+
+    resolved = 0
+    unmatched = []
+    for row in rows:
+        if row["usda_fdc_id"]:
+            record = records.get(int(row["usda_fdc_id"]))
+        else:
+            record = matches.get(row["food_name"])
+            if not record:
+                unmatched.append(row["food_name"])
+        if not record or not row["amount_g"]:
+            continue
+        row["usda_fdc_id"] = str(record["fdcId"])
+        scaled = scale_nutrients(record, float(row["amount_g"]))
+        for col in NUTRIENT_COLUMNS:
+            if not row[col] and scaled.get(col) is not None:
+                row[col] = scaled[col]
+        resolved += 1
+    return resolved, unmatched
+
+
+def import_entries(path: str, fmt: str, mapping: dict = None, resolve_foods: bool = False,
+                   dedupe: bool = True, chunk_size: int = 5000, dry_run: bool = False, store=None) -> dict:
+    """Stream records from `path` into the intake store; returns counts and the first errors.
+
+    Counts are "read", "imported", "duplicates", "invalid", "resolved" and
+    "unresolved"; "unmatched" lists the food names left unresolved.
+    Duplicates from earlier chunks are found in the log once written; a dry
+    run, which writes nothing, remembers the keys of the entries it would
+    import instead.
+    """
+    store = store or open_store()
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "resolved": 0, "unresolved": 0,
+             "errors": []}
+    unmatched = set()
+    would_import = set()  # dry run only
+    matches = {}
+
+    records = read_records(path, fmt)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        valid = []
+        for line_num, record in chunk:
+            stats["read"] += 1
+            try:
+                valid.append(to_row(record, mapping))
+            except ValueError as e:
+                stats["invalid"] += 1
+                if len(stats["errors"]) < MAX_ERRORS:
+                    stats["errors"].append(f"line {line_num}: {e}")
+
+        rows = valid
+        if dedupe:
+            seen = logged_keys(store, valid) | would_import
+            rows = []
+            for row in valid:
+                key = entry_key(row)
+                if key in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+                rows.append(row)
+                if dry_run:
+                    would_import.add(key)
+
+        if resolve_foods and rows:
+            resolved, names = resolve(rows, matches)
+            stats["resolved"] += resolved
+            stats["unresolved"] += len(names)
+            unmatched.update(names)
+        if rows and not dry_run:
+            store.append(rows)
+        stats["imported"] += len(rows)
+    stats["unmatched"] = sorted(unmatched)
+    return stats
+
+
+def _mapping_arg(value: str):
+    source, sep, column = value.rpartition("=")
+    if not sep or not source or column not in COLUMNS:
+        raise argparse.ArgumentTypeError(f"expected SOURCE=COLUMN with an intake column, got {value!r}")
+    return source, column
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import food history from a CSV or JSON lines export")
+    parser.add_argument("file", help="CSV or JSON lines file ('-' for stdin)")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="Input format (default: from the file extension, csv for stdin)")
+    parser.add_argument("--map", type=_mapping_arg, action="append", default=[], metavar="SOURCE=COLUMN",
+                        help="Read intake column COLUMN from source column SOURCE (repeatable)")
+    parser.add_argument("--resolve", action="store_true",
+                        help="Match foods without an FDC ID to USDA and fill blank nutrients")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Import entries even if the same timestamp, food and amount is already logged")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Entries per write (default: 5000)")
+    parser.add_argument("--dry-run", action="store_true", help="Check and count, but don't write anything")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
+
+    args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
+
+    if args.file != "-" and not Path(args.file).exists():
+        print(f"Error: {args.file} not found")
+        sys.exit(1)
+    fmt = args.format
+    if not fmt:
+        fmt = "jsonl" if Path(args.file).suffix.lower() in (".jsonl", ".ndjson") else "csv"
+
+    stats = import_entries(args.file, fmt, dict(args.map), args.resolve, not args.keep_duplicates,
+                           max(1, args.chunk_size), args.dry_run)
+
+    verb = "Would import" if args.dry_run else "Imported"
+    print(f"{verb} {stats['imported']} of {stats['read']} entries from {args.file}")
+    if stats["duplicates"]:
+        print(f"  Skipped {stats['duplicates']} already logged")
+    if args.resolve:
+        print(f"  Matched {stats['resolved']} to USDA foods")
+    if stats["unresolved"]:
+        print(f"  Left {stats['unresolved']} unresolved (no exact or whole-word USDA match):")
+        for name in stats["unmatched"][:MAX_ERRORS]:
+            print(f"    {name}")
+        if len(stats["unmatched"]) > MAX_ERRORS:
+            print(f"    ... and {len(stats['unmatched']) - MAX_ERRORS} more foods")
+    if stats["invalid"]:
+        print(f"  Skipped {stats['invalid']} invalid:")
+        for error in stats["errors"]:
+            print(f"    {error}")
+        if stats["invalid"] > len(stats["errors"]):
+            print(f"    ... and {stats['invalid'] - len(stats['errors'])} more")
+
+
+if __name__ == "__main__":
+    main()
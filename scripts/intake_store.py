@@ -0,0 +1,1521 @@
+#!/usr/bin/env python3
+"""Storage for the intake log: intake.csv (default), monthly CSV partitions
+or an indexed SQLite database.
+
+Scripts read and change entries through open_store() instead of opening
+data/intake.csv themselves. Entries are dicts of strings keyed by column,
+as csv.DictReader returns them, paired with an entry ID for edit/delete:
+
+- csv: the file's id column, assigned when the entry is logged and never
+  reused; files from before IDs use row numbers (the header is row 1)
+  until --assign-ids adds the column
+- partitioned: the id column, unique across all months
+- sqlite: fixed when the entry is added and never reused; entries brought
+  in with --import-csv keep their IDs (or CSV row numbers)
+
+The SQLite backend (data/intake.db, indexed on date and food name) is used
+once it exists, then the partitioned layout (data/intake/YYYY-MM.csv) once
+that directory exists; BITE_STORAGE=csv|partitioned|sqlite forces a choice.
+--import-csv/--partition and --export-csv convert losslessly between
+them, so the single CSV stays the portable format.
+
+Each profile (one person's log) has its own data directory, chosen with
+--profile or BITE_PROFILE: data/ itself for the default profile and
+data/profiles/<name>/ for the others. The files above live in that
+directory and the backend is chosen per profile; open_store(profile)
+serves any profile from one process. The USDA dataset is shared.
+
+All backends keep per-day nutrient totals (daily_totals) in a rollup
+cache under data/cache/, updated as entries change and rebuilt if the log
+was changed behind our back. CSV files also get an index there (byte
+ranges of each day's rows and of each entry) so date-bounded reads and
+lookups by ID skip the rest of the file, and partitioned logs one of the
+month holding each entry.
+
+Writers hold an advisory lock (intake.csv.lock, intake.db.lock or
+intake/.lock) for the whole change, and rewrites go through a temp file
+renamed into place, so concurrent scripts can log, edit and delete at the
+same time. Readers take the lock briefly to snapshot the file and journal
+and never see a half-written change.
+"""
+
+import argparse
+import csv
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import tracing
+from tracing import add_trace_argument, start_tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; rewrites are still atomic renames
+    fcntl = None
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+CSV_FILE = DATA_DIR / "intake.csv"
+DB_FILE = DATA_DIR / "intake.db"
+PARTITION_DIR = DATA_DIR / "intake"
+PROFILES_DIR = DATA_DIR / "profiles"
+
+# The profile whose data lives directly in data/
+DEFAULT_PROFILE = "default"
+
+COLUMNS = [
+    "timestamp", "food_name", "amount_g", "usda_fdc_id", "calories", "protein_g", "carbs_g",
+    "fiber_g", "sugar_g", "fat_g", "saturated_fat_g", "trans_fat_g",
+    "cholesterol_mg", "sodium_mg", "potassium_mg", "calcium_mg", "iron_mg",
+    "magnesium_mg", "phosphorus_mg", "zinc_mg", "copper_mg", "manganese_mg",
+    "selenium_mcg", "vitamin_a_mcg", "vitamin_c_mg", "vitamin_d_mcg",
+    "vitamin_e_mg", "vitamin_k_mcg", "vitamin_b1_mg", "vitamin_b2_mg",
+    "vitamin_b3_mg", "vitamin_b5_mg", "vitamin_b6_mg", "vitamin_b7_mcg",
+    "vitamin_b9_mcg", "vitamin_b12_mcg", "omega3_g", "omega6_g", "water_g",
+    "caffeine_mg", "alcohol_g", "notes"
+]
+
+# Columns holding nutrient amounts (everything except entry metadata)
+NUTRIENT_COLUMNS = [c for c in COLUMNS if c not in ("timestamp", "food_name", "amount_g", "usda_fdc_id", "notes")]
+
+# Stable entry ID, the first column of CSV files created or migrated with --assign-ids
+ID_COLUMN = "id"
+
+
+def entry_date(timestamp: str) -> str:
+    """Calendar date (YYYY-MM-DD) of an ISO timestamp."""
+    return timestamp[:10]
+
+
+def _text(value) -> str:
+    """Value as csv.writer would write it."""
+    return "" if value is None else str(value)
+
+
+def _quoted(columns) -> str:
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def _entry_id(value):
+    """Entry ID from an id cell, or None if it isn't a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches(row: dict, food: str = None, date: str = None) -> bool:
+    if food and food.lower() not in row.get("food_name", "").lower():
+        return False
+    if date and not row.get("timestamp", "").startswith(date):
+        return False
+    return True
+
+
+def _number(value) -> float:
+    """Numeric value of a CSV cell; blanks and junk count as 0, as in the summaries."""
+    if value and str(value).strip():
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return 0.0
+
+
+def file_stamp(path: Path) -> str:
+    """Cheap change checkpoint for a file: size, mtime and a hash of its tail."""
+    if not path.exists():
+        return "missing"
+    st = path.stat()
+    with open(path, "rb") as f:
+        f.seek(max(0, st.st_size - 65536))
+        tail = hashlib.sha256(f.read()).hexdigest()[:16]
+    return f"{st.st_size}:{st.st_mtime_ns}:{tail}"
+
+
+def _replace(path: Path, write):
+    """Write a file through a temp file and rename it into place, so readers see old or new, never half."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", newline="") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _lines(f, end: int):
+    """Decoded lines of a binary file from its position up to byte `end`."""
+    pos = f.tell()
+    while pos < end:
+        line = f.readline(end - pos)
+        if not line:
+            break
+        pos += len(line)
+        yield line.decode()
+
+
+class FileLock:
+    """Advisory lock (flock) on a lock file, re-entrant within a process.
+
+    Writers hold it exclusively for a whole change (file, journal and
+    caches); readers hold it shared just long enough to take a consistent
+    snapshot. Without fcntl (Windows) it does nothing.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._exclusive = False
+
+    @contextmanager
+    def _hold(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        if self._depth == 0:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._exclusive = exclusive
+        elif exclusive and not self._exclusive:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._exclusive = True
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+
+    def shared(self):
+        return self._hold(False)
+
+    def exclusive(self):
+        return self._hold(True)
+
+
+def _exclusive(method):
+    """Run a store method under the store's exclusive lock (all writes)."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.exclusive():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def _shared(method):
+    """Run a store method under the store's shared lock (reads that must not see a write half done)."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.shared():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class Rollups:
+    """Per-day nutrient totals and entry counts for a store, cached in SQLite.
+
+    The cache records a stamp of the log file it matches. Our own writes
+    update the totals incrementally and restamp; if the file changed any
+    other way the stamp no longer matches and the cache is rebuilt with one
+    pass over the entries on the next read.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.cache_dir / f"rollups-{store.cache_key}.sqlite3"
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            cols = ", ".join(f'"{c}" REAL NOT NULL DEFAULT 0' for c in NUTRIENT_COLUMNS)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS days (date TEXT PRIMARY KEY, "
+                               f"entries INTEGER NOT NULL, {cols})")
+        return self._conn
+
+    def is_current(self) -> bool:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+        return row is not None and row[0] == self.store.stamp()
+
+    def _restamp(self):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stamp', ?)",
+                          (self.store.stamp(),))
+        self.conn.commit()
+
+    def _add(self, rows, sign: int):
+        """Add (sign=1) or subtract (sign=-1) rows from their days' totals."""
+        deltas = {}
+        for row in rows:
+            date = entry_date(_text(row.get("timestamp")))
+            day = deltas.setdefault(date, [0] + [0.0] * len(NUTRIENT_COLUMNS))
+            day[0] += sign
+            for i, col in enumerate(NUTRIENT_COLUMNS, start=1):
+                day[i] += sign * _number(row.get(col))
+
+        cols = _quoted(NUTRIENT_COLUMNS)
+        updates = ", ".join(f'"{c}" = round("{c}" + ?, 6)' for c in NUTRIENT_COLUMNS)
+        for date, day in deltas.items():
+            self.conn.execute(f"INSERT OR IGNORE INTO days (date, entries, {cols}) "
+                              f"VALUES (?, 0, {', '.join('0' * len(NUTRIENT_COLUMNS))})", (date,))
+            self.conn.execute(f"UPDATE days SET entries = entries + ?, {updates} WHERE date = ?",
+                              (*day, date))
+        self.conn.execute("DELETE FROM days WHERE entries <= 0")
+
+    @tracing.traced("intake.rollups.rebuild")
+    def rebuild(self):
+        """Recompute every day from the log in a single pass."""
+        self.conn.execute("DELETE FROM days")
+        self._add((row for _, row in self.store.entries()), 1)
+        self._restamp()
+
+    def after_write(self, was_current: bool, added=(), removed=()):
+        """Fold a write into the totals, if they matched the log before it."""
+        if was_current:
+            self._add(removed, -1)
+            self._add(added, 1)
+            self._restamp()
+
+    @tracing.traced("intake.rollups.totals")
+    def totals(self, start: str = None, end: str = None) -> dict:
+        """{date: {"entries": n, column: total, ...}} for days with entries in start..end."""
+        if not self.is_current():
+            self.rebuild()
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        result = {}
+        for date, entries, *values in self.conn.execute(
+                f"SELECT date, entries, {_quoted(NUTRIENT_COLUMNS)} FROM days {where} ORDER BY date", params):
+            result[date] = {"entries": entries, **dict(zip(NUTRIENT_COLUMNS, values))}
+        tracing.note(days=len(result))
+        return result
+
+
+class CsvIndex:
+    """Sidecar index of a CSV log: where each date's rows and each entry live.
+
+    Dates are indexed as runs, maximal stretches of consecutive rows with
+    the same date, with their byte range and the row number of their first
+    row, so a date-bounded read seeks straight to its slice of the file. A
+    file appended in date order has one run per day; rows added out of
+    order just start new runs. Entries are indexed by ID (the id column, or
+    the row number in files without one) with their own byte range, so
+    get/update/delete go straight to the row.
+
+    Appends extend the index; any other change to the file (compaction,
+    hand edits) is caught by the stamp and the index is rebuilt on the next
+    read.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.cache_dir / f"index-{store.cache_key}.sqlite3"
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS runs (start INTEGER PRIMARY KEY, "
+                               "end INTEGER NOT NULL, date TEXT NOT NULL, first_row INTEGER NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS runs_date ON runs (date)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, "
+                               "start INTEGER NOT NULL, end INTEGER NOT NULL)")
+        return self._conn
+
+    def _meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(k, str(v)) for k, v in values.items()])
+
+    def is_current(self) -> bool:
+        return self._meta("stamp") == file_stamp(self.store.path)
+
+    def current(self):
+        """The index, rebuilt first if the file changed since it was built."""
+        if not self.is_current():
+            self.rebuild()
+        return self
+
+    @property
+    def header(self) -> list:
+        return json.loads(self._meta("header") or "null") or list(COLUMNS)
+
+    @property
+    def max_id(self) -> int:
+        return int(self._meta("max_id") or 0)
+
+    def _scan(self, f, header: list, next_row: int):
+        """Yield (row_number, entry_id, start, end, date) for each row from f's position on."""
+        pos = f.tell()
+        end = [pos]
+
+        def lines():
+            for line in iter(f.readline, b""):
+                end[0] += len(line)
+                yield line.decode()
+
+        ts = header.index("timestamp") if "timestamp" in header else None
+        id_col = header.index(ID_COLUMN) if ID_COLUMN in header else None
+        for record in csv.reader(lines()):
+            if record:  # csv.DictReader skips blank lines without numbering them
+                date = entry_date(record[ts]) if ts is not None and ts < len(record) else ""
+                if id_col is None:
+                    entry_id = next_row
+                else:
+                    entry_id = _entry_id(record[id_col] if id_col < len(record) else "")
+                yield next_row, entry_id, pos, end[0], date
+                next_row += 1
+            pos = end[0]
+
+    def _add(self, scanned):
+        """Index scanned rows, extending the last run where it continues; returns the next row number."""
+        last = self.conn.execute("SELECT start, end, date FROM runs ORDER BY start DESC LIMIT 1").fetchone()
+        run = list(last) if last else None
+        runs, entries, next_row = [], [], None
+        for row_number, entry_id, start, end, date in scanned:
+            if run and run[2] == date and run[1] == start:
+                run[1] = end
+            else:
+                if run:
+                    runs.append(run)
+                run = [start, end, date, row_number]
+            if entry_id is not None:
+                entries.append((entry_id, start, end))
+            next_row = row_number + 1
+        if run:
+            runs.append(run)
+        for start, end, date, *first in runs:
+            if first:
+                self.conn.execute("INSERT OR REPLACE INTO runs (start, end, date, first_row) "
+                                  "VALUES (?, ?, ?, ?)", (start, end, date, first[0]))
+            else:
+                self.conn.execute("UPDATE runs SET end = ? WHERE start = ?", (end, start))
+        self.conn.executemany("INSERT OR REPLACE INTO entries (id, start, end) VALUES (?, ?, ?)", entries)
+        if entries:
+            self._set_meta(max_id=max(self.max_id, *(e[0] for e in entries)))
+        return next_row
+
+    @tracing.traced("intake.index.rebuild")
+    def rebuild(self):
+        """Index the whole file in one pass."""
+        self.conn.execute("DELETE FROM runs")
+        self.conn.execute("DELETE FROM entries")
+        self._set_meta(max_id=0)
+        header, next_row = list(COLUMNS), 2
+        if self.store.exists():
+            with open(self.store.path, "rb") as f:
+                header = next(csv.reader([f.readline().decode()]), None) or header
+                next_row = self._add(self._scan(f, header, 2)) or 2
+        self._set_meta(header=json.dumps(header), next_row=next_row,
+                       stamp=file_stamp(self.store.path))
+        self.conn.commit()
+
+    def after_append(self, was_current: bool, offset: int):
+        """Index rows appended at byte `offset`, if the index matched the file before."""
+        if not was_current or offset == 0:
+            return
+        with open(self.store.path, "rb") as f:
+            f.seek(offset)
+            next_row = self._add(self._scan(f, self.header, int(self._meta("next_row"))))
+        if next_row:
+            self._set_meta(next_row=next_row)
+        self._set_meta(stamp=file_stamp(self.store.path))
+        self.conn.commit()
+
+    @tracing.traced("intake.index.ranges")
+    def ranges(self, start: str = None, end: str = None) -> list:
+        """[(byte_start, byte_end, first_row_number)] covering rows dated start..end, in file order."""
+        self.current()
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        merged = []
+        for run_start, run_end, first_row in self.conn.execute(
+                f"SELECT start, end, first_row FROM runs {where} ORDER BY start", params):
+            if merged and merged[-1][1] == run_start:
+                merged[-1][1] = run_end
+            else:
+                merged.append([run_start, run_end, first_row])
+        tracing.note(ranges=len(merged))
+        return [tuple(r) for r in merged]
+
+    @tracing.traced("intake.index.locate")
+    def locate(self, entry_id: int):
+        """(byte_start, byte_end) of an entry's row, or None."""
+        return self.current().conn.execute(
+            "SELECT start, end FROM entries WHERE id = ?", (entry_id,)).fetchone()
+
+
+class CsvStore:
+    """Entries in data/intake.csv, with edits and deletes in a journal beside it.
+
+    Files carry a stable entry ID in their first column (ID_COLUMN); files
+    from before that keep using row numbers until migrated with
+    assign_ids(). The ID is not part of the row dicts the store returns.
+
+    New entries are appended to the file. Edits and deletes are appended to
+    data/intake.journal (one JSON record per line: entry ID, old and new
+    values or a tombstone) and applied when reading, so a correction is a
+    single small write and undo() just drops the last record. compact()
+    folds the journal back into the file.
+    """
+
+    name = "csv"
+
+    def __init__(self, path: Path = None, cache_key: str = None, lock: FileLock = None, cache_dir: Path = None):
+        self.path = path or CSV_FILE
+        self.journal_path = self.path.with_suffix(".journal")
+        self.cache_key = cache_key or self.name
+        self.cache_dir = cache_dir or self.path.parent / "cache"
+        self.lock = lock or FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._journal_state = None
+        self.rollups = Rollups(self)
+        self.index = CsvIndex(self)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def header(self) -> list:
+        """The file's header row, including ID_COLUMN if it has one."""
+        if not self.exists():
+            return [ID_COLUMN, *COLUMNS]
+        with open(self.path, "r", newline="") as f:
+            return next(csv.reader(f), None) or [ID_COLUMN, *COLUMNS]
+
+    @property
+    def fieldnames(self) -> list:
+        return [c for c in self.header if c != ID_COLUMN]
+
+    @property
+    def has_ids(self) -> bool:
+        return ID_COLUMN in self.header
+
+    def _rows(self, reader, first_row: int):
+        """(entry_id, row) pairs from a DictReader, taking the ID out of id-column rows."""
+        for row_number, row in enumerate(reader, start=first_row):
+            if ID_COLUMN in row:
+                yield _entry_id(row.pop(ID_COLUMN)), row
+            else:
+                yield row_number, row
+
+    @tracing.traced("intake.rewrite")
+    def _rewrite(self, header: list, rows: list):
+        """Replace the file with (entry_id, row) pairs; IDs are written if the header has ID_COLUMN."""
+        tracing.note(file=self.path.name, rows=len(rows))
+        def write(f):
+            writer = csv.DictWriter(f, fieldnames=header)
+            writer.writeheader()
+            for entry_id, row in rows:
+                writer.writerow({ID_COLUMN: entry_id, **row} if ID_COLUMN in header else row)
+
+        _replace(self.path, write)
+
+    def _journal(self):
+        """({entry_id: edited row}, {deleted entry_ids}) from the change journal."""
+        stamp = file_stamp(self.journal_path)
+        if self._journal_state is None or self._journal_state[0] != stamp:
+            edited, deleted, top = {}, set(), 0
+            if self.journal_path.exists():
+                with tracing.span("intake.journal.read", file=self.journal_path.name), \
+                        open(self.journal_path, "r") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        record = json.loads(line)
+                        top = max(top, record["id"])
+                        # Later records win: an entry can move out of a month and back in
+                        if record["op"] == "edit":
+                            edited[record["id"]] = record["row"]
+                            deleted.discard(record["id"])
+                        elif record["op"] == "delete":
+                            deleted.add(record["id"])
+                            edited.pop(record["id"], None)
+            self._journal_state = (stamp, edited, deleted, top)
+        return self._journal_state[1:3]
+
+    @tracing.traced("intake.journal.write")
+    def _log(self, record: dict):
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def stamp(self) -> str:
+        """Change checkpoint for the rollup cache: the file plus its journal."""
+        return f"{file_stamp(self.path)}+{file_stamp(self.journal_path)}"
+
+    def next_id(self) -> int:
+        """ID for the next new entry; IDs of deleted entries are never reused."""
+        self._journal()
+        return max(self.index.current().max_id, self._journal_state[3], 1) + 1
+
+    def _snapshot(self, start: str = None, end: str = None):
+        """A consistent view of the file and journal for one read.
+
+        Taken under the shared lock: the open file (rewrites replace it, so
+        the handle keeps this version), its size (later appends are ignored),
+        the index ranges for start..end and the journal state.
+        """
+        with self.lock.shared():
+            f = open(self.path, "rb")
+            size = os.fstat(f.fileno()).st_size
+            ranges = header = None
+            if start or end:
+                ranges = self.index.ranges(start, end)
+                header = self.index.header
+            edited, deleted = self._journal()
+        return f, size, ranges, header, edited, deleted
+
+    def _base_entries(self, f, size: int, ranges, header):
+        """(entry_id, row) pairs as written in a snapshot of the file, without the journal applied."""
+        try:
+            if ranges is None:
+                yield from self._rows(csv.DictReader(_lines(f, size)), 2)
+                return
+            for byte_start, byte_end, first_row in ranges:
+                f.seek(byte_start)
+                yield from self._rows(csv.DictReader(_lines(f, min(byte_end, size)), fieldnames=header), first_row)
+        finally:
+            f.close()
+
+    def entries(self, start: str = None, end: str = None):
+        """Yield (entry_id, row) for entries dated start..end (inclusive), in file order.
+
+        Date-bounded reads only parse the slices of the file the index
+        points at; unbounded reads stream the whole file. Journaled edits
+        and deletes are applied on the way out.
+        """
+        return tracing.rows("intake.read", self._entries(start, end), file=self.path.name)
+
+    def _entries(self, start: str = None, end: str = None):
+        if not self.exists():
+            return
+        f, size, ranges, header, edited, deleted = self._snapshot(start, end)
+        base = self._base_entries(f, size, ranges, header)
+        if not (edited or deleted):
+            yield from base
+            return
+
+        def in_range(row):
+            date = entry_date(row.get("timestamp") or "")
+            return not ((start and date < start) or (end and date > end))
+
+        # Edited entries are placed by their edited date, which may lie
+        # outside the slices their original date points to
+        moved_in = {i: row for i, row in edited.items() if i not in deleted and in_range(row)}
+        for entry_id, row in base:
+            while moved_in and min(moved_in) < entry_id:
+                i = min(moved_in)
+                yield i, moved_in.pop(i)
+            if entry_id in deleted:
+                continue
+            if entry_id in edited:
+                row = moved_in.pop(entry_id, None)
+                if row is None:
+                    continue
+            yield entry_id, row
+        for i in sorted(moved_in):
+            yield i, moved_in[i]
+
+    @tracing.traced("intake.search")
+    def search(self, food: str = None, date: str = None) -> list:
+        """(entry_id, row) pairs whose food name contains `food` and timestamp starts with `date`."""
+        rows = self.entries(date[:10], date[:10] + "\uffff") if date else self.entries()
+        return [(i, row) for i, row in rows if _matches(row, food, date)]
+
+    @tracing.traced("intake.get")
+    @_shared
+    def get(self, entry_id: int):
+        """One entry by ID through the index, or None if not found."""
+        edited, deleted = self._journal()
+        if entry_id in deleted:
+            return None
+        if entry_id in edited:
+            return dict(edited[entry_id])
+        if not self.exists():
+            return None
+        located = self.index.locate(entry_id)
+        if located is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(located[0])
+            text = f.read(located[1] - located[0]).decode()
+        reader = csv.DictReader(io.StringIO(text, newline=""), fieldnames=self.index.header)
+        return next((row for _, row in self._rows(reader, entry_id)), None)
+
+    @tracing.traced("intake.append")
+    @_exclusive
+    def append(self, rows: list, ids: list = None) -> list:
+        """Append rows (dicts keyed by COLUMNS) in a single write; returns their entry IDs.
+
+        New files get an ID column; `ids` keeps given IDs instead of
+        allocating new ones (used when an entry moves between files).
+        """
+        tracing.note(rows=len(rows))
+        if self.exists() and not self.has_ids and not any(True for _ in self.entries()):
+            self.assign_ids()  # header-only file from before IDs: nothing to migrate
+        new_file = not self.exists() or self.path.stat().st_size == 0
+        header = [ID_COLUMN, *COLUMNS] if new_file else self.header
+        if ID_COLUMN in header:
+            first = self.next_id()
+            ids = list(ids) if ids else list(range(first, first + len(rows)))
+        else:
+            first = int(self.index.current()._meta("next_row"))
+            ids = list(range(first, first + len(rows)))
+
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=header)
+        if new_file:
+            writer.writeheader()
+        for entry_id, row in zip(ids, rows):
+            writer.writerow({ID_COLUMN: entry_id, **row} if ID_COLUMN in header else row)
+        current = self.rollups.is_current()
+        indexed = self.index.is_current()
+        offset = 0 if new_file else self.path.stat().st_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)  # first entry of a new profile
+        with open(self.path, "a", newline="") as f:
+            f.write(buf.getvalue())
+        self.rollups.after_write(current, added=rows)
+        self.index.after_append(indexed, offset)
+        return ids
+
+    @tracing.traced("intake.update")
+    @_exclusive
+    def update(self, entry_id: int, changes: dict):
+        """Apply {column: value} to one entry; returns the old row, or None if not found.
+
+        The change is appended to the journal; the file itself is only
+        rewritten by compact().
+        """
+        old = self.get(entry_id)
+        if old is None:
+            return None
+        changes = {k: _text(v) for k, v in changes.items()}
+        new = {**old, **changes}
+        current = self.rollups.is_current()
+        self._log({"op": "edit", "id": entry_id, "at": datetime.now().isoformat(),
+                   "old": {k: old.get(k, "") for k in changes}, "new": changes, "row": new})
+        self.rollups.after_write(current, added=[new], removed=[old])
+        return old
+
+    @tracing.traced("intake.delete")
+    @_exclusive
+    def delete(self, entry_id: int, note: dict = None):
+        """Remove one entry; returns it, or None if not found.
+
+        Deleting records a tombstone in the journal (plus any `note` fields);
+        the entry leaves the file on the next compact().
+        """
+        old = self.get(entry_id)
+        if old is None:
+            return None
+        current = self.rollups.is_current()
+        self._log({"op": "delete", "id": entry_id, "at": datetime.now().isoformat(), "row": old, **(note or {})})
+        self.rollups.after_write(current, removed=[old])
+        return old
+
+    @_exclusive
+    def adopt(self, entry_id: int, row: dict, note: dict = None):
+        """Add an entry under an existing ID through the journal (an entry moving in from another file)."""
+        row = {c: _text(row.get(c)) for c in COLUMNS}
+        current = self.rollups.is_current()
+        self._log({"op": "edit", "id": entry_id, "at": datetime.now().isoformat(),
+                   "old": {}, "new": row, "row": row, **(note or {})})
+        self.rollups.after_write(current, added=[row])
+
+    def _journal_lines(self) -> list:
+        if not self.journal_path.exists():
+            return []
+        with open(self.journal_path, "r") as f:
+            return [line for line in f if line.strip()]
+
+    def last_change(self):
+        """The most recent edit or delete in the journal, or None."""
+        lines = self._journal_lines()
+        record = json.loads(lines[-1]) if lines else None
+        # A compacted journal may start with a reserve record, which isn't a change
+        return record if record and record["op"] != "reserve" else None
+
+    @tracing.traced("intake.undo")
+    @_exclusive
+    def undo(self):
+        """Drop the last edit or delete from the journal; returns its record, or None if there is none."""
+        record = self.last_change()
+        if record is None:
+            return None
+        lines = self._journal_lines()
+        before = self.get(record["id"])
+        current = self.rollups.is_current()
+        _replace(self.journal_path, lambda f: f.writelines(lines[:-1]))
+        after = self.get(record["id"])
+        self.rollups.after_write(current, added=[after] if after else [], removed=[before] if before else [])
+        return record
+
+    @tracing.traced("intake.compact")
+    @_exclusive
+    def compact(self) -> int:
+        """Fold the journal into the file and remove it; returns the number of changes folded.
+
+        In files without an ID column, entries after a deleted one get new
+        (lower) row numbers.
+        """
+        changes = sum(1 for line in self._journal_lines() if json.loads(line)["op"] != "reserve")
+        if not changes:
+            return 0
+        top = self.next_id() - 1
+        rows = list(self.entries())
+        current = self.rollups.is_current()
+        self._rewrite(self.header, rows)
+        self.journal_path.unlink()
+        if self.has_ids and (not rows or max(i for i, _ in rows) < top):
+            # Keep the IDs of deleted trailing entries from being handed out again
+            self._log({"op": "reserve", "id": top})
+        self.rollups.after_write(current)
+        return changes
+
+    @tracing.traced("intake.assign_ids")
+    @_exclusive
+    def assign_ids(self) -> int:
+        """Give a file without an ID column one, using each entry's current row number.
+
+        The journal is compacted first; returns the number of entries.
+        """
+        if self.has_ids:
+            return 0
+        self.compact()
+        rows = list(self.entries())
+        current = self.rollups.is_current()
+        self._rewrite([ID_COLUMN, *self.fieldnames], rows)
+        self.rollups.after_write(current)
+        return len(rows)
+
+    @_shared
+    def daily_totals(self, start: str = None, end: str = None) -> dict:
+        """Per-day totals from the rollup cache (see Rollups.totals)."""
+        return self.rollups.totals(start, end)
+
+
+class SqliteStore:
+    """Entries in data/intake.db, indexed on date and lowercased food name.
+
+    Values are kept as the exact strings the CSV would hold, so exporting
+    gives back the same file content.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Path = None):
+        self.path = path or DB_FILE
+        self.cache_key = self.name
+        self.cache_dir = self.path.parent / "cache"
+        self.lock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._conn = None
+        self.rollups = Rollups(self)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def stamp(self) -> str:
+        return file_stamp(self.path)
+
+    @property
+    def conn(self):
+        """Connection to the database, creating the schema on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if self._meta("columns") is None:
+                self._create(COLUMNS)
+        return self._conn
+
+    def _meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _create(self, fieldnames: list):
+        cols = ", ".join(f'"{c}" TEXT NOT NULL DEFAULT \'\'' for c in fieldnames)
+        self._conn.execute("DROP TABLE IF EXISTS entries")
+        self._conn.execute(f"CREATE TABLE entries (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, "
+                           f"food_key TEXT NOT NULL, {cols})")
+        self._conn.execute("CREATE INDEX entries_date ON entries (date)")
+        self._conn.execute("CREATE INDEX entries_food ON entries (food_key)")
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('columns', ?)",
+                           (json.dumps(fieldnames),))
+        # New databases export their IDs; import_csv records whether the source had them
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('ids', '1')")
+        self._conn.commit()
+
+    @property
+    def fieldnames(self) -> list:
+        self.conn  # make sure the schema exists
+        return json.loads(self._meta("columns"))
+
+    def _select(self, where: str = "", params=()):
+        cols = self.fieldnames
+        sql = f"SELECT id, {_quoted(cols)} FROM entries {where} ORDER BY id"
+        for row_id, *values in self.conn.execute(sql, params):
+            yield row_id, dict(zip(cols, values))
+
+    def _insert(self, rows, ids=None):
+        cols = self.fieldnames
+        sql = (f"INSERT INTO entries (id, date, food_key, {_quoted(cols)}) "
+               f"VALUES ({', '.join('?' * (len(cols) + 3))})")
+        ids = ids or [None] * len(rows)
+        self.conn.executemany(sql, (
+            (row_id, entry_date(_text(row.get("timestamp"))), _text(row.get("food_name")).lower(),
+             *(_text(row.get(c)) for c in cols))
+            for row_id, row in zip(ids, rows)))
+
+    def entries(self, start: str = None, end: str = None):
+        """Yield (row_id, row) for entries dated start..end (inclusive), in insertion order."""
+        if not self.exists():
+            return iter(())
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        return tracing.rows("intake.read", self._select(f"WHERE {' AND '.join(clauses)}" if clauses else "", params),
+                            file=self.path.name)
+
+    @tracing.traced("intake.search")
+    def search(self, food: str = None, date: str = None) -> list:
+        """(row_id, row) pairs whose food name contains `food` and timestamp starts with `date`."""
+        if not self.exists():
+            return []
+        clauses, params = [], []
+        if food:
+            clauses.append("instr(food_key, ?) > 0")
+            params.append(food.lower())
+        if date:
+            # The date index narrows to the matching day(s); the prefix check is exact
+            clauses.append("date >= ? AND date <= ?")
+            params.extend([date[:10], date[:10] + "\uffff"])
+        return [(i, row) for i, row in self._select(f"WHERE {' AND '.join(clauses)}" if clauses else "", params)
+                if _matches(row, food, date)]
+
+    @tracing.traced("intake.get")
+    def get(self, row_id: int):
+        if not self.exists():
+            return None
+        return next((row for _, row in self._select("WHERE id = ?", (row_id,))), None)
+
+    @tracing.traced("intake.append")
+    @_exclusive
+    def append(self, rows: list, ids: list = None) -> list:
+        """Append rows (dicts keyed by COLUMNS) in one transaction; returns their entry IDs."""
+        tracing.note(rows=len(rows))
+        current = self.rollups.is_current()
+        self._insert(rows, ids)
+        if not ids:
+            last = self.conn.execute("SELECT max(id) FROM entries").fetchone()[0]
+            ids = list(range(last - len(rows) + 1, last + 1))
+        self.conn.commit()
+        self.rollups.after_write(current, added=rows)
+        return ids
+
+    @tracing.traced("intake.update")
+    @_exclusive
+    def update(self, row_id: int, changes: dict):
+        """Apply {column: value} to one entry; returns the old row, or None if not found."""
+        old = self.get(row_id)
+        if old is None:
+            return None
+        new = {**old, **{k: _text(v) for k, v in changes.items()}}
+        sets = ", ".join(f'"{c}" = ?' for c in changes)
+        current = self.rollups.is_current()
+        self.conn.execute(f"UPDATE entries SET date = ?, food_key = ?, {sets} WHERE id = ?",
+                          (entry_date(new.get("timestamp", "")), new.get("food_name", "").lower(),
+                           *(new[c] for c in changes), row_id))
+        self.conn.commit()
+        self.rollups.after_write(current, added=[new], removed=[old])
+        return old
+
+    @tracing.traced("intake.delete")
+    @_exclusive
+    def delete(self, row_id: int):
+        """Remove one entry; returns it, or None if not found."""
+        old = self.get(row_id)
+        if old is not None:
+            current = self.rollups.is_current()
+            self.conn.execute("DELETE FROM entries WHERE id = ?", (row_id,))
+            self.conn.commit()
+            self.rollups.after_write(current, removed=[old])
+        return old
+
+    @_shared
+    def daily_totals(self, start: str = None, end: str = None) -> dict:
+        """Per-day totals from the rollup cache (see Rollups.totals)."""
+        return self.rollups.totals(start, end)
+
+    @tracing.traced("intake.import_csv")
+    @_exclusive
+    def import_csv(self, path: Path):
+        """Replace all entries with the contents of a CSV file, keeping its header and entry IDs
+        (row numbers for files without an ID column)."""
+        with open(path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or list(COLUMNS)
+            rows = list(reader)
+        has_ids = ID_COLUMN in fieldnames
+        if has_ids:
+            ids = [_entry_id(row.pop(ID_COLUMN)) for row in rows]
+            fieldnames = [c for c in fieldnames if c != ID_COLUMN]
+        else:
+            ids = list(range(2, len(rows) + 2))
+        self.conn  # make sure the schema exists
+        self._create(fieldnames)
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('ids', ?)", (str(int(has_ids)),))
+        self._insert(rows, ids)
+        self.conn.commit()
+        return len(rows)
+
+    def export_csv(self, path: Path):
+        """Write all entries to a CSV file with the original header (and IDs, if it had them)."""
+        with_ids = self.exists() and self.conn is not None and self._meta("ids") == "1"
+        count = 0
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[ID_COLUMN, *self.fieldnames] if with_ids else self.fieldnames)
+            writer.writeheader()
+            for entry_id, row in self.entries():
+                writer.writerow({ID_COLUMN: entry_id, **row} if with_ids else row)
+                count += 1
+        return count
+
+
+class PartitionIndex:
+    """Which month holds each entry of a partitioned store, and the highest ID, cached in SQLite.
+
+    Built from the months' own indexes and journals, so lookups by ID and
+    new IDs don't have to ask every month. Like CsvIndex it records a stamp
+    of the files it matches (every month's file and journal); our own
+    appends, edits and deletes update it in place and restamp, and any
+    other change is caught by the stamp and rebuilt on the next read.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.cache_dir / f"index-{store.cache_key}.sqlite3"
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, month TEXT NOT NULL)")
+        return self._conn
+
+    def _meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(k, str(v)) for k, v in values.items()])
+
+    def is_current(self) -> bool:
+        return self._meta("stamp") == self.store.stamp()
+
+    def current(self):
+        """The index, rebuilt first if any month changed since it was built."""
+        with self.store.lock.shared():
+            if not self.is_current():
+                self.rebuild()
+        return self
+
+    @property
+    def max_id(self) -> int:
+        return int(self._meta("max_id") or 0)
+
+    @tracing.traced("intake.partitions.rebuild")
+    def rebuild(self):
+        """Collect every month's entry IDs from its index and journal."""
+        self.conn.execute("DELETE FROM entries")
+        top = 0
+        for month in self.store._months():
+            part = self.store._part(month)
+            edited, deleted = part._journal()
+            ids = {i for i, in part.index.current().conn.execute("SELECT id FROM entries")}
+            self.conn.executemany("INSERT OR REPLACE INTO entries (id, month) VALUES (?, ?)",
+                                  [(i, month) for i in (ids | edited.keys()) - deleted])
+            top = max(top, part.next_id() - 1)
+        self._set_meta(max_id=top, stamp=self.store.stamp())
+        self.conn.commit()
+
+    def after_write(self, was_current: bool, added: dict = None, removed=()):
+        """Fold a write ({entry_id: month} added, entry IDs removed) in, if the index matched before it."""
+        if not was_current:
+            return
+        self.conn.executemany("DELETE FROM entries WHERE id = ?", [(i,) for i in removed])
+        if added:
+            self.conn.executemany("INSERT OR REPLACE INTO entries (id, month) VALUES (?, ?)", added.items())
+            self._set_meta(max_id=max(self.max_id, *added))
+        self._set_meta(stamp=self.store.stamp())
+        self.conn.commit()
+
+    @tracing.traced("intake.partitions.locate")
+    def locate(self, entry_id: int):
+        """The month holding an entry, or None."""
+        row = self.current().conn.execute("SELECT month FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else None
+
+
+class PartitionedStore:
+    """Entries in monthly CSV files, data/intake/YYYY-MM.csv.
+
+    Each month is a CsvStore with the usual header (plus ID column),
+    journal, rollups and index; queries only open the months their date
+    range touches, and compacting a month rewrites only that month. Entries
+    whose timestamp has no month go to undated.csv.
+
+    Entry IDs are unique across all months; a store-level index
+    (PartitionIndex) maps each to its month and tracks the highest ID.
+    """
+
+    name = "partitioned"
+
+    def __init__(self, path: Path = None):
+        self.path = path or PARTITION_DIR
+        self.cache_key = self.name
+        self.cache_dir = self.path.parent / "cache"
+        # One lock for all months: moving an entry changes two files at once
+        self.lock = FileLock(self.path / ".lock")
+        self._parts = {}
+        self.index = PartitionIndex(self)
+
+    def exists(self) -> bool:
+        return self.path.is_dir() and any(self.path.glob("*.csv"))
+
+    @property
+    def fieldnames(self) -> list:
+        months = self._months()
+        return self._part(months[0]).fieldnames if months else list(COLUMNS)
+
+    @staticmethod
+    def month_of(row: dict) -> str:
+        month = entry_date(_text(row.get("timestamp")))[:7]
+        return month if re.fullmatch(r"\d{4}-\d{2}", month) else "undated"
+
+    def _part(self, month: str) -> CsvStore:
+        if month not in self._parts:
+            self._parts[month] = CsvStore(self.path / f"{month}.csv", cache_key=f"intake-{month}",
+                                          lock=self.lock, cache_dir=self.cache_dir)
+        return self._parts[month]
+
+    def _months(self, start: str = None, end: str = None) -> list:
+        """Months with a partition file that can hold entries dated start..end."""
+        if not self.path.is_dir():
+            return []
+        months = sorted(p.stem for p in self.path.glob("*.csv"))
+        if start or end:
+            # Undated rows never fall inside a date range
+            months = [m for m in months if m != "undated"
+                      and (not start or m >= start[:7]) and (not end or m <= end[:7])]
+        return months
+
+    def stamp(self) -> str:
+        """Change checkpoint for the partition index: every month's file and journal."""
+        if not self.path.is_dir():
+            return "missing"
+        # Size and mtime only: hashing every month's tail would cost more than the lookups it saves
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith((".csv", ".journal")):
+                st = entry.stat()
+                files.append(f"{entry.name}={st.st_size}:{st.st_mtime_ns}")
+        return hashlib.sha256("|".join(sorted(files)).encode()).hexdigest()[:16]
+
+    def _locate(self, entry_id: int):
+        """(month, row) holding an entry, or (None, None)."""
+        with self.lock.shared():
+            month = self.index.locate(entry_id)
+            row = self._part(month).get(entry_id) if month else None
+        return (month, row) if row is not None else (None, None)
+
+    def entries(self, start: str = None, end: str = None):
+        """Yield (entry_id, row) for entries dated start..end (inclusive), month by month."""
+        for month in self._months(start, end):
+            yield from self._part(month).entries(start, end)
+
+    @tracing.traced("intake.search")
+    def search(self, food: str = None, date: str = None) -> list:
+        """(entry_id, row) pairs whose food name contains `food` and timestamp starts with `date`."""
+        months = self._months(date[:10], date[:10] + "\uffff") if date else self._months()
+        return [pair for month in months for pair in self._part(month).search(food, date)]
+
+    def get(self, entry_id: int):
+        return self._locate(entry_id)[1]
+
+    def next_id(self) -> int:
+        """ID for the next new entry, above every ID used in any month."""
+        return max(self.index.current().max_id, 1) + 1
+
+    @tracing.traced("intake.append")
+    @_exclusive
+    def append(self, rows: list, ids: list = None) -> list:
+        """Append rows to their months' files, one write per month; returns their entry IDs."""
+        tracing.note(rows=len(rows))
+        if not ids:
+            first = self.next_id()
+            ids = list(range(first, first + len(rows)))
+        by_month = {}
+        for entry_id, row in zip(ids, rows):
+            by_month.setdefault(self.month_of(row), []).append((entry_id, row))
+        self.path.mkdir(parents=True, exist_ok=True)
+        indexed = self.index.is_current()
+        for month, pairs in by_month.items():
+            self._part(month).append([row for _, row in pairs], ids=[i for i, _ in pairs])
+        self.index.after_write(indexed, added={i: month for month, pairs in by_month.items() for i, _ in pairs})
+        return ids
+
+    @tracing.traced("intake.update")
+    @_exclusive
+    def update(self, entry_id: int, changes: dict):
+        """Apply {column: value} to one entry; returns the old row, or None if not found.
+
+        An entry whose timestamp moves to another month moves to that
+        month's file, keeping its ID: a tombstone in the old month's journal
+        and the row in the new month's, each pointing at the other so undo
+        reverts both.
+        """
+        month, old = self._locate(entry_id)
+        if old is None:
+            return None
+        new = {**old, **{k: _text(v) for k, v in changes.items()}}
+        target = self.month_of(new)
+        indexed = self.index.is_current()
+        if target == month:
+            self._part(month).update(entry_id, changes)
+            self.index.after_write(indexed)
+            return old
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not self._part(target).exists():
+            self._part(target).append([])
+        self._part(month).delete(entry_id, note={"moved_to": target})
+        self._part(target).adopt(entry_id, new, note={"moved_from": month})
+        self.index.after_write(indexed, added={entry_id: target})
+        return old
+
+    @tracing.traced("intake.delete")
+    @_exclusive
+    def delete(self, entry_id: int):
+        """Remove one entry; returns it, or None if not found."""
+        month, old = self._locate(entry_id)
+        if old is None:
+            return None
+        indexed = self.index.is_current()
+        self._part(month).delete(entry_id)
+        self.index.after_write(indexed, removed=[entry_id])
+        return old
+
+    @tracing.traced("intake.undo")
+    @_exclusive
+    def undo(self):
+        """Undo the most recent edit or delete in any month; returns its record, or None."""
+        latest = None
+        for month in self._months():
+            record = self._part(month).last_change()
+            if record and (latest is None or record.get("at", "") > latest[1].get("at", "")):
+                latest = (month, record)
+        if latest is None:
+            return None
+        record = self._part(latest[0]).undo()
+        other = record.get("moved_to") or record.get("moved_from")
+        if other:
+            self._part(other).undo()
+        return record
+
+    @tracing.traced("intake.compact")
+    @_exclusive
+    def compact(self) -> int:
+        """Compact every month's journal; returns the number of changes folded.
+
+        IDs stay put, so the partition index only needs restamping.
+        """
+        indexed = self.index.is_current()
+        changes = sum(self._part(month).compact() for month in self._months())
+        self.index.after_write(indexed)
+        return changes
+
+    def assign_ids(self) -> int:
+        """Monthly files always carry IDs; nothing to migrate."""
+        return 0
+
+    def daily_totals(self, start: str = None, end: str = None) -> dict:
+        """Per-day totals merged from the rollup caches of the months in range."""
+        totals = {}
+        for month in self._months(start, end):
+            totals.update(self._part(month).daily_totals(start, end))
+        return dict(sorted(totals.items()))
+
+    @tracing.traced("intake.import_csv")
+    @_exclusive
+    def import_csv(self, path: Path):
+        """Split a single-file CSV into monthly files, replacing any existing partitions.
+
+        Entries keep their IDs; a file without an ID column gets its row
+        numbers as IDs, as with --assign-ids.
+        """
+        with open(path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            header = reader.fieldnames or list(COLUMNS)
+            by_month = {}
+            for row_number, row in enumerate(reader, start=2):
+                entry_id = _entry_id(row.pop(ID_COLUMN)) if ID_COLUMN in row else row_number
+                by_month.setdefault(self.month_of(row), []).append((entry_id, row))
+        self.path.mkdir(parents=True, exist_ok=True)
+        for old in [*self.path.glob("*.csv"), *self.path.glob("*.journal")]:
+            old.unlink()
+        self._parts = {}
+        header = [ID_COLUMN, *(c for c in header if c != ID_COLUMN)]
+        for month, pairs in by_month.items():
+            self._part(month)._rewrite(header, pairs)
+        return sum(len(pairs) for pairs in by_month.values())
+
+    def export_csv(self, path: Path):
+        """Write all entries, month by month, to a single CSV file with their IDs."""
+        count = 0
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[ID_COLUMN, *self.fieldnames])
+            writer.writeheader()
+            for entry_id, row in self.entries():
+                writer.writerow({ID_COLUMN: entry_id, **row})
+                count += 1
+        return count
+
+
+_PROFILE_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]*")
+_profile = None  # set by use_profile(); otherwise $BITE_PROFILE
+_local = threading.local()
+
+
+def profile_dir(profile: str = None) -> Path:
+    """Directory with a profile's intake log, targets.csv, templates.json and caches.
+
+    The default profile keeps using data/ itself; others live in
+    data/profiles/<name>/. The USDA dataset in data/usda/ is shared.
+    """
+    name = profile or active_profile()
+    if name == DEFAULT_PROFILE:
+        return DATA_DIR
+    if not _PROFILE_NAME.fullmatch(name):
+        raise ValueError(f"Invalid profile name '{name}' (use letters, digits, '-' and '_')")
+    return PROFILES_DIR / name
+
+
+def active_profile() -> str:
+    """The profile scripts act on: the one given to use_profile(), else $BITE_PROFILE, else the default."""
+    return _profile or os.environ.get("BITE_PROFILE") or DEFAULT_PROFILE
+
+
+def use_profile(name: str = None):
+    """Make `name` the active profile for this process (None goes back to $BITE_PROFILE)."""
+    global _profile
+    if name:
+        profile_dir(name)
+    _profile = name
+
+
+def profiles() -> list:
+    """All profile names: the default one, then each directory under data/profiles/."""
+    names = []
+    if PROFILES_DIR.is_dir():
+        names = sorted(p.name for p in PROFILES_DIR.iterdir()
+                       if p.is_dir() and p.name != DEFAULT_PROFILE and _PROFILE_NAME.fullmatch(p.name))
+    return [DEFAULT_PROFILE, *names]
+
+
+def _profile_arg(name: str) -> str:
+    try:
+        profile_dir(name)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return name
+
+
+def add_profile_argument(parser):
+    """Add --profile to a script's parser; pass the parsed value to use_profile()."""
+    parser.add_argument("--profile", type=_profile_arg,
+                        help="Use this person's data in data/profiles/NAME/ (default: $BITE_PROFILE, "
+                             "else the data/ directory)")
+
+
+def open_store(profile: str = None):
+    """The intake store of a profile, default the active one (see module docstring for the backend).
+
+    Stores are kept per profile (and thread), so a long-running process
+    serving several profiles reuses each one's connections and caches.
+    """
+    root = profile_dir(profile)
+    kind = os.environ.get("BITE_STORAGE")
+    if not kind:
+        kind = ("sqlite" if (root / DB_FILE.name).exists()
+                else "partitioned" if (root / PARTITION_DIR.name).is_dir() else "csv")
+    stores = getattr(_local, "stores", None)
+    if stores is None:
+        stores = _local.stores = {}
+    if (root, kind) not in stores:
+        if kind == "sqlite":
+            store = SqliteStore(root / DB_FILE.name)
+        elif kind == "partitioned":
+            store = PartitionedStore(root / PARTITION_DIR.name)
+        elif kind == "csv":
+            store = CsvStore(root / CSV_FILE.name)
+        else:
+            raise ValueError(f"Unknown BITE_STORAGE '{kind}' (expected csv, sqlite or partitioned)")
+        stores[(root, kind)] = store
+    return stores[(root, kind)]
+
+
+def _compact_source(path: Path):
+    """Fold a CSV's pending journal into it before it is imported, so edits and deletes come along."""
+    source = CsvStore(path)
+    count = source.compact() if source.journal_path.exists() else 0
+    if count:
+        print(f"Compacted {count} journaled change(s) into {path} first")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage intake storage")
+    parser.add_argument("--status", action="store_true", help="Show the active backend and entry count")
+    parser.add_argument("--profiles", action="store_true", help="List profiles with their backend and entry count")
+    parser.add_argument("--import-csv", type=str, nargs="?", const="", metavar="PATH",
+                        help="Load a CSV (default the profile's intake.csv) into its intake.db, replacing its entries")
+    parser.add_argument("--compact", action="store_true",
+                        help="Fold journaled edits and deletes into the CSV file(s); entry IDs don't change, "
+                             "except row numbers in an intake.csv from before IDs (run --assign-ids first)")
+    parser.add_argument("--undo", action="store_true", help="Revert the last edit or delete")
+    parser.add_argument("--assign-ids", action="store_true",
+                        help="Add a stable id column to an intake.csv from before entry IDs "
+                             "(each entry keeps its current row number as ID)")
+    parser.add_argument("--partition", type=str, nargs="?", const="", metavar="PATH",
+                        help="Split a CSV (default the profile's intake.csv) into monthly files under its "
+                             "intake/ directory, replacing them")
+    parser.add_argument("--export-csv", type=str, nargs="?", const="", metavar="PATH",
+                        help="Write all entries from the profile's intake.db or intake/ to a CSV "
+                             "(default its intake.csv)")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
+
+    args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
+    root = profile_dir()
+
+    if args.import_csv is not None:
+        path = Path(args.import_csv or root / CSV_FILE.name)
+        if not path.exists():
+            print(f"Error: {path} not found")
+            sys.exit(1)
+        _compact_source(path)
+        count = SqliteStore(root / DB_FILE.name).import_csv(path)
+        print(f"Imported {count} entries from {path} into {root / DB_FILE.name}")
+        print("Scripts now read and write the SQLite database")
+
+    elif args.partition is not None:
+        path = Path(args.partition or root / CSV_FILE.name)
+        if not path.exists():
+            print(f"Error: {path} not found")
+            sys.exit(1)
+        _compact_source(path)
+        store = PartitionedStore(root / PARTITION_DIR.name)
+        count = store.import_csv(path)
+        print(f"Split {count} entries from {path} into {len(store._months())} monthly files in {store.path}")
+        if (root / DB_FILE.name).exists():
+            print(f"Note: {root / DB_FILE.name} exists and is still used unless BITE_STORAGE=partitioned")
+        else:
+            print("Scripts now read and write the monthly files")
+
+    elif args.export_csv is not None:
+        store = open_store()
+        if store.name == "csv" or not store.exists():
+            print(f"Error: no {DB_FILE.name} or {PARTITION_DIR.name}/ data found in {root} - nothing to export")
+            sys.exit(1)
+        args.export_csv = args.export_csv or str(root / CSV_FILE.name)
+        count = store.export_csv(Path(args.export_csv))
+        print(f"Exported {count} entries from {store.path} to {args.export_csv}")
+
+    elif args.assign_ids:
+        store = open_store()
+        if not hasattr(store, "assign_ids") or not store.exists():
+            print(f"The {store.name} backend already has stable entry IDs")
+            sys.exit(1)
+        count = store.assign_ids()
+        print(f"Added IDs to {count} entries in {store.path}" if count else f"{store.path} already has IDs")
+
+    elif args.compact or args.undo:
+        store = open_store()
+        if not hasattr(store, "compact"):
+            print(f"The {store.name} backend changes entries in place - nothing to "
+                  f"{'compact' if args.compact else 'undo'}")
+            sys.exit(1)
+        if args.compact:
+            count = store.compact()
+            print(f"Compacted {count} journaled change(s)" if count else "Nothing to compact")
+            if count and not getattr(store, "has_ids", True):
+                print("Row numbers after deleted entries shifted down; --assign-ids gives this log stable IDs")
+        else:
+            record = store.undo()
+            if record is None:
+                print("Nothing to undo")
+            else:
+                food_name = record["row"].get("food_name", "entry")
+                action = "deletion of" if record["op"] == "delete" else "edit to"
+                print(f"Undid {action} {food_name} (ID {record['id']})")
+
+    elif args.profiles:
+        for name in profiles():
+            store = open_store(name)
+            count = sum(1 for _ in store.entries()) if store.exists() else 0
+            marker = "*" if name == active_profile() else " "
+            print(f"{marker} {name:16s} {store.name:12s} {count:6d} entries  {profile_dir(name)}")
+
+    elif args.status:
+        store = open_store()
+        count = sum(1 for _ in store.entries())
+        print(f"Profile: {active_profile()}")
+        print(f"Backend: {store.name} ({store.path})")
+        print(f"Entries: {count}")
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,42 +2,73 @@
 """Log a food entry to intake.csv"""
 
 import argparse
-import csv
 import json
+import sys
 from datetime import datetime
 from pathlib import Path
-import subprocess
 
-DATA_FILE = Path(__file__).parent.parent / "data" / "intake.csv"
-LOOKUP_SCRIPT = Path(__file__).parent / "lookup_usda.py"
+import nutrition
+from intake_store import COLUMNS, NUTRIENT_COLUMNS, add_profile_argument, open_store, use_profile
+from tracing import add_trace_argument, start_tracing
 
-COLUMNS = [
-    "timestamp", "food_name", "amount_g", "usda_fdc_id", "calories", "protein_g", "carbs_g",
-    "fiber_g", "sugar_g", "fat_g", "saturated_fat_g", "trans_fat_g",
-    "cholesterol_mg", "sodium_mg", "potassium_mg", "calcium_mg", "iron_mg",
-    "magnesium_mg", "phosphorus_mg", "zinc_mg", "copper_mg", "manganese_mg",
-    "selenium_mcg", "vitamin_a_mcg", "vitamin_c_mg", "vitamin_d_mcg",
-    "vitamin_e_mg", "vitamin_k_mcg", "vitamin_b1_mg", "vitamin_b2_mg",
-    "vitamin_b3_mg", "vitamin_b5_mg", "vitamin_b6_mg", "vitamin_b7_mcg",
-    "vitamin_b9_mcg", "vitamin_b12_mcg", "omega3_g", "omega6_g", "water_g",
-    "caffeine_mg", "alcohol_g", "notes"
-]
+# USDA keys match CSV columns (both use protein_g, etc.)
+# Arg names use short forms (protein, carbs, etc.)
+ARG_TO_CSV = {
+    "calories": "calories",
+    "protein": "protein_g",
+    "carbs": "carbs_g",
+    "fat": "fat_g",
+    "fiber": "fiber_g",
+    "sugar": "sugar_g",
+    "saturated_fat": "saturated_fat_g",
+    "trans_fat": "trans_fat_g",
+    "cholesterol": "cholesterol_mg",
+    "sodium": "sodium_mg",
+    "potassium": "potassium_mg",
+    "calcium": "calcium_mg",
+    "iron": "iron_mg",
+    "magnesium": "magnesium_mg",
+    "phosphorus": "phosphorus_mg",
+    "zinc": "zinc_mg",
+    "copper": "copper_mg",
+    "manganese": "manganese_mg",
+    "selenium": "selenium_mcg",
+    "vitamin_a": "vitamin_a_mcg",
+    "vitamin_c": "vitamin_c_mg",
+    "vitamin_d": "vitamin_d_mcg",
+    "vitamin_e": "vitamin_e_mg",
+    "vitamin_k": "vitamin_k_mcg",
+    "vitamin_b1": "vitamin_b1_mg",
+    "vitamin_b2": "vitamin_b2_mg",
+    "vitamin_b3": "vitamin_b3_mg",
+    "vitamin_b5": "vitamin_b5_mg",
+    "vitamin_b6": "vitamin_b6_mg",
+    "vitamin_b7": "vitamin_b7_mcg",
+    "vitamin_b9": "vitamin_b9_mcg",
+    "vitamin_b12": "vitamin_b12_mcg",
+    "omega3": "omega3_g",
+    "omega6": "omega6_g",
+    "water": "water_g",
+    "caffeine": "caffeine_mg",
+    "alcohol": "alcohol_g",
+}
+
+# Keys a --batch item may use besides the nutrient overrides
+BATCH_KEYS = {
+    "food": "food", "food_name": "food",
+    "amount": "amount", "amount_g": "amount",
+    "usda_id": "usda_id", "usda_fdc_id": "usda_id",
+    "timestamp": "timestamp",
+    "notes": "notes",
+}
 
 
 def lookup_usda(fdc_id: int) -> dict:
     """Look up USDA data by FDC ID, returns per-100g values."""
-    result = subprocess.run(
-        ["python3", str(LOOKUP_SCRIPT), "--id", str(fdc_id), "--json"],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        raise ValueError(f"USDA lookup failed: {result.stderr}")
-
-    data = json.loads(result.stdout)
-    if not data:
+    record = nutrition.get_by_id(fdc_id)
+    if not record:
         raise ValueError(f"No food found with FDC ID {fdc_id}")
-    return data[0]
+    return record
 
 
 def scale_nutrients(nutrients: dict, amount_g: float) -> dict:
@@ -52,10 +83,148 @@ def scale_nutrients(nutrients: dict, amount_g: float) -> dict:
     return scaled
 
 
+def build_row(food: str, amount: float, usda_nutrients: dict = None, overrides: dict = None,
+              timestamp: str = None, notes: str = None, usda_id: int = None) -> dict:
+    """Build a CSV row from scaled USDA nutrients plus manual overrides.
+
+    overrides maps CSV columns to values and wins over USDA values.
+    usda_id is recorded only when usda_nutrients were found for it.
+    """
+    row = {col: "" for col in COLUMNS}
+    row["timestamp"] = timestamp or datetime.now().isoformat(timespec='seconds')
+    row["food_name"] = food
+    row["amount_g"] = amount
+
+    if usda_nutrients:
+        row["usda_fdc_id"] = usda_id
+        # Apply USDA values (keys already match CSV columns)
+        for csv_col in COLUMNS:
+            if csv_col in usda_nutrients and csv_col != "food_name":
+                val = usda_nutrients[csv_col]
+                if val is not None and val != "":
+                    row[csv_col] = val
+
+    # Override with manual values
+    for csv_col, val in (overrides or {}).items():
+        if val is not None:
+            row[csv_col] = val
+
+    row["notes"] = notes or ""
+    return row
+
+
+def append_rows(rows: list):
+    """Append rows to the intake log in a single write."""
+    open_store().append(rows)
+
+
+def print_logged(row: dict):
+    print(f"Logged: {row['food_name']} ({row['amount_g']}g)")
+    if row.get("usda_fdc_id"):
+        print(f"  Source: USDA FDC ID {row['usda_fdc_id']}")
+    if row.get("calories"):
+        print(f"  Calories: {row['calories']}")
+    if row.get("protein_g"):
+        print(f"  Protein: {row['protein_g']}g")
+    if row.get("carbs_g"):
+        print(f"  Carbs: {row['carbs_g']}g")
+    if row.get("fat_g"):
+        print(f"  Fat: {row['fat_g']}g")
+
+
+def read_batch(path: str) -> list:
+    """Read batch items from a JSON array or JSON lines file ('-' for stdin)."""
+    text = sys.stdin.read() if path == "-" else Path(path).read_text()
+    text = text.strip()
+    if text.startswith("["):
+        items = json.loads(text)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not all(isinstance(item, dict) for item in items):
+        raise ValueError("each batch item must be a JSON object")
+    return items
+
+
+def parse_batch_item(item: dict) -> dict:
+    """Normalize one batch item, raising ValueError if it is invalid."""
+    parsed = {"overrides": {}}
+    for key, val in item.items():
+        if key in BATCH_KEYS:
+            parsed[BATCH_KEYS[key]] = val
+        elif key in ARG_TO_CSV or key in ARG_TO_CSV.values():
+            col = ARG_TO_CSV.get(key, key)
+            try:
+                parsed["overrides"][col] = None if val is None else float(val)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a number, got {val!r}")
+        else:
+            raise ValueError(f"unknown field '{key}'")
+
+    if not parsed.get("food"):
+        raise ValueError("missing 'food'")
+    try:
+        parsed["amount"] = float(parsed["amount"])
+    except KeyError:
+        raise ValueError("missing 'amount'")
+    except (TypeError, ValueError):
+        raise ValueError(f"amount must be a number, got {parsed['amount']!r}")
+    if parsed.get("usda_id") is not None:
+        try:
+            parsed["usda_id"] = int(parsed["usda_id"])
+        except (TypeError, ValueError):
+            raise ValueError(f"usda_id must be an integer, got {parsed['usda_id']!r}")
+    if parsed.get("timestamp"):
+        try:
+            datetime.fromisoformat(parsed["timestamp"])
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid timestamp {parsed['timestamp']!r}")
+    return parsed
+
+
+def log_batch(items: list, timestamp: str = None) -> list:
+    """Validate and log many foods with one USDA lookup and one write.
+
+    Nothing is written if any item is invalid. Items without their own
+    timestamp share `timestamp` (default: now). Returns the logged rows.
+    """
+    parsed = []
+    errors = []
+    for i, item in enumerate(items, start=1):
+        try:
+            parsed.append(parse_batch_item(item))
+        except ValueError as e:
+            errors.append(f"item {i}: {e}")
+    if errors:
+        raise ValueError("; ".join(errors))
+
+    timestamp = timestamp or datetime.now().isoformat(timespec='seconds')
+    usda_ids = [p["usda_id"] for p in parsed if p.get("usda_id")]
+    try:
+        records = nutrition.get_many(usda_ids)
+    except Exception as e:
+        print(f"Warning: USDA lookup failed: {e}")
+        records = {}
+
+    rows = []
+    for p in parsed:
+        usda_nutrients = None
+        if p.get("usda_id"):
+            if p["usda_id"] in records:
+                usda_nutrients = scale_nutrients(records[p["usda_id"]], p["amount"])
+            else:
+                print(f"Warning: No food found with FDC ID {p['usda_id']} for {p['food']}")
+                print("Continuing with manually provided values...")
+        rows.append(build_row(p["food"], p["amount"], usda_nutrients, p["overrides"],
+                              p.get("timestamp") or timestamp, p.get("notes"), p.get("usda_id")))
+
+    append_rows(rows)
+    return rows
+
+
 def main():
     parser = argparse.ArgumentParser(description="Log food to intake.csv")
-    parser.add_argument("--food", required=True, help="Food name")
-    parser.add_argument("--amount", type=float, required=True, help="Amount in grams")
+    parser.add_argument("--food", help="Food name")
+    parser.add_argument("--amount", type=float, help="Amount in grams")
     parser.add_argument("--usda-id", type=int, help="USDA FDC ID - auto-fetches and scales nutrients")
     parser.add_argument("--calories", type=float, help="Calories (kcal)")
     parser.add_argument("--protein", type=float, help="Protein (g)")
@@ -96,16 +265,31 @@ def main():
     parser.add_argument("--alcohol", type=float, help="Alcohol (g)")
     parser.add_argument("--notes", type=str, help="Optional notes")
     parser.add_argument("--timestamp", type=str, help="ISO timestamp (default: now)")
+    parser.add_argument("--batch", type=str, metavar="FILE",
+                        help="Log many foods from a JSON array or JSON lines file ('-' for stdin). "
+                             "Items: {\"food\", \"amount\", optional \"usda_id\", \"timestamp\", "
+                             "\"notes\" and nutrient overrides like \"protein\"}")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
-    # Build row
-    timestamp = args.timestamp or datetime.now().isoformat(timespec='seconds')
+    if args.batch:
+        try:
+            rows = log_batch(read_batch(args.batch), args.timestamp)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            print("Nothing was logged")
+            sys.exit(1)
+        for row in rows:
+            print_logged(row)
+        print(f"\nLogged {len(rows)} entries")
+        return
 
-    row = {col: "" for col in COLUMNS}
-    row["timestamp"] = timestamp
-    row["food_name"] = args.food
-    row["amount_g"] = args.amount
+    if args.food is None or args.amount is None:
+        parser.error("--food and --amount are required (or use --batch)")
 
     # If USDA ID provided, fetch and scale nutrients
     usda_nutrients = {}
@@ -113,85 +297,16 @@ def main():
         try:
             raw_nutrients = lookup_usda(args.usda_id)
             usda_nutrients = scale_nutrients(raw_nutrients, args.amount)
-            row["usda_fdc_id"] = args.usda_id
         except Exception as e:
             print(f"Warning: USDA lookup failed: {e}")
             print("Continuing with manually provided values...")
 
-    # USDA keys match CSV columns (both use protein_g, etc.)
-    # Arg names use short forms (protein, carbs, etc.)
-    arg_to_csv = {
-        "calories": "calories",
-        "protein": "protein_g",
-        "carbs": "carbs_g",
-        "fat": "fat_g",
-        "fiber": "fiber_g",
-        "sugar": "sugar_g",
-        "saturated_fat": "saturated_fat_g",
-        "trans_fat": "trans_fat_g",
-        "cholesterol": "cholesterol_mg",
-        "sodium": "sodium_mg",
-        "potassium": "potassium_mg",
-        "calcium": "calcium_mg",
-        "iron": "iron_mg",
-        "magnesium": "magnesium_mg",
-        "phosphorus": "phosphorus_mg",
-        "zinc": "zinc_mg",
-        "copper": "copper_mg",
-        "manganese": "manganese_mg",
-        "selenium": "selenium_mcg",
-        "vitamin_a": "vitamin_a_mcg",
-        "vitamin_c": "vitamin_c_mg",
-        "vitamin_d": "vitamin_d_mcg",
-        "vitamin_e": "vitamin_e_mg",
-        "vitamin_k": "vitamin_k_mcg",
-        "vitamin_b1": "vitamin_b1_mg",
-        "vitamin_b2": "vitamin_b2_mg",
-        "vitamin_b3": "vitamin_b3_mg",
-        "vitamin_b5": "vitamin_b5_mg",
-        "vitamin_b6": "vitamin_b6_mg",
-        "vitamin_b7": "vitamin_b7_mcg",
-        "vitamin_b9": "vitamin_b9_mcg",
-        "vitamin_b12": "vitamin_b12_mcg",
-        "omega3": "omega3_g",
-        "omega6": "omega6_g",
-        "water": "water_g",
-        "caffeine": "caffeine_mg",
-        "alcohol": "alcohol_g",
-    }
-
-    # Apply USDA values (keys already match CSV columns)
-    for csv_col in COLUMNS:
-        if csv_col in usda_nutrients and csv_col != "food_name":
-            val = usda_nutrients[csv_col]
-            if val is not None and val != "":
-                row[csv_col] = val
-
-    # Override with manual values
-    for arg_name, csv_col in arg_to_csv.items():
-        arg_val = getattr(args, arg_name.replace("-", "_"), None)
-        if arg_val is not None:
-            row[csv_col] = arg_val
-
-    row["notes"] = args.notes or ""
-
-    # Append to CSV
-    with open(DATA_FILE, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=COLUMNS)
-        writer.writerow(row)
-
-    print(f"Logged: {args.food} ({args.amount}g)")
-    if row.get("usda_fdc_id"):
-        print(f"  Source: USDA FDC ID {row['usda_fdc_id']}")
-    if row.get("calories"):
-        print(f"  Calories: {row['calories']}")
-    if row.get("protein_g"):
-        print(f"  Protein: {row['protein_g']}g")
-    if row.get("carbs_g"):
-        print(f"  Carbs: {row['carbs_g']}g")
-    if row.get("fat_g"):
-        print(f"  Fat: {row['fat_g']}g")
+    overrides = {csv_col: getattr(args, arg_name) for arg_name, csv_col in ARG_TO_CSV.items()}
+    row = build_row(args.food, args.amount, usda_nutrients, overrides,
+                    args.timestamp, args.notes, args.usda_id)
 
+    append_rows([row])
+    print_logged(row)
 
 if __name__ == "__main__":
     main()
@@ -3,17 +3,24 @@
 
 import argparse
 import json
-import subprocess
-from pathlib import Path
 from datetime import datetime
 
-TEMPLATES_FILE = Path(__file__).parent.parent / "data" / "templates.json"
-LOG_SCRIPT = Path(__file__).parent / "log_entry.py"
+import nutrition
+import tracing
+from intake_store import add_profile_argument, profile_dir, use_profile
+from log_entry import append_rows, build_row, log_batch, parse_batch_item
+from tracing import add_trace_argument, start_tracing
 
+def templates_file():
+    """Templates JSON file of the active profile"""
+    return profile_dir() / "templates.json"
+
+@tracing.traced("templates.load")
 def load_templates():
     """Load templates from JSON file"""
-    if TEMPLATES_FILE.exists():
-        with open(TEMPLATES_FILE, "r") as f:
+    path = templates_file()
+    if path.exists():
+        with open(path, "r") as f:
             return json.load(f)
     return {}
 
@@ -47,37 +54,57 @@ def log_template(template_name, timestamp=None, notes=None):
 
     print(f"Logging template '{template_name}' ({len(foods)} items)...\n")
 
-    # Log each food
-    success_count = 0
+    if notes:
+        combined_notes = f"{template_name} - {notes}"
+    else:
+        combined_notes = f"Template: {template_name}"
+
+    # Validate each food, then log the good ones in one write
+    valid = []
     for food in foods:
-        food_name = food["food_name"]
-        amount_g = food["amount_g"]
-        usda_fdc_id = food.get("usda_fdc_id")
-
-        # Build command
-        cmd = [
-            "python3", str(LOG_SCRIPT),
-            food_name,
-            "--amount", str(amount_g),
-            "--timestamp", timestamp
-        ]
-
-        if usda_fdc_id:
-            cmd.extend(["--usda-id", str(usda_fdc_id)])
-
-        if notes:
-            combined_notes = f"{template_name} - {notes}"
-            cmd.extend(["--notes", combined_notes])
-        else:
-            cmd.extend(["--notes", f"Template: {template_name}"])
+        item = {
+            "food": food.get("food_name"),
+            "amount": food.get("amount_g"),
+            "timestamp": timestamp,
+            "notes": combined_notes,
+        }
+        if food.get("usda_fdc_id"):
+            item["usda_id"] = food["usda_fdc_id"]
+        try:
+            parsed = parse_batch_item(item)
+        except ValueError as e:
+            print(f"✗ Failed to log {food.get('food_name', 'unnamed food')}: {e}")
+            continue
+        valid.append((food, item, parsed))
+
+    # Snapshots from another USDA dataset are stale: look the foods up again instead
+    snapshot = "dataset" in template
+    if template.get("dataset"):
+        try:
+            current = nutrition.dataset_version()
+        except Exception:
+            current = None  # no USDA data to compare with; the snapshot is all there is
+        if current and current != template["dataset"]:
+            print(f"Note: '{template_name}' was saved with {template['dataset']}, USDA data is now {current} - "
+                  f"looking its foods up again (manage_templates.py --refresh {template_name} updates it)\n")
+            snapshot = False
 
-        # Run log_entry.py
+    success_count = 0
+    if valid:
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            print(f"✓ {food_name} ({amount_g}g)")
-            success_count += 1
-        except subprocess.CalledProcessError as e:
-            print(f"✗ Failed to log {food_name}: {e.stderr}")
+            if snapshot:
+                # Saved nutrient snapshots (see manage_templates.py) - no USDA lookups
+                append_rows([build_row(p["food"], p["amount"], food.get("nutrients"), None,
+                                       timestamp, combined_notes, p.get("usda_id"))
+                             for food, _, p in valid])
+            else:
+                log_batch([item for _, item, _ in valid], timestamp)
+        except (OSError, ValueError) as e:
+            print(f"✗ Failed to log {len(valid)} items: {e}")
+        else:
+            for _, item, _ in valid:
+                print(f"✓ {item['food']} ({item['amount']}g)")
+            success_count = len(valid)
 
     print(f"\nLogged {success_count}/{len(foods)} items from '{template_name}'")
     return success_count == len(foods)
@@ -87,8 +114,12 @@ def main():
     parser.add_argument("template", help="Template name to log")
     parser.add_argument("--timestamp", type=str, help="Timestamp (ISO format, default: now)")
     parser.add_argument("--notes", type=str, help="Additional notes")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
     log_template(args.template, args.timestamp, args.notes)
 
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Keep the USDA dataset and indexes loaded and answer lookups over a Unix socket.
+
+lookup_usda.py, log_entry.py and edit_entry.py use the server automatically
+when it is running and fall back to in-process lookups otherwise. The
+dataset is shared by all profiles, so one server serves everyone.
+
+Protocol: one JSON request per line ({"query": ...} or {"id": ...}, or the
+batch forms {"ids": [...]} and {"queries": [...]}; optional "limit" and
+"portions"; {"version": true} asks which dataset is loaded), answered with one line holding the JSON list run_lookup()
+returns (for single lookups what `lookup_usda.py --json` prints), or
+{"error": "..."}. A request may carry "trace" (tracing.context() of the
+client), which files the server's spans for it under the client's trace
+when the server runs with --trace.
+"""
+
+import argparse
+import json
+import signal
+import socket
+import socketserver
+import sys
+from pathlib import Path
+
+import lookup_usda
+import tracing
+from tracing import add_trace_argument, start_tracing
+
+
+class LookupServer(socketserver.UnixStreamServer):
+    """Single-threaded: lookups take milliseconds and share one SQLite connection."""
+
+    def warm(self):
+        """Load the dataset and indexes so the first request is fast."""
+        self.stamp = lookup_usda._source_stamp(lookup_usda.DATA_FILE)
+        lookup_usda.load_data()
+        lookup_usda.search_foods("warmup", 1)
+
+    def refresh(self):
+        """Reload if the USDA source file changed since we loaded it."""
+        if lookup_usda._source_stamp(lookup_usda.DATA_FILE) != self.stamp:
+            lookup_usda.reset_cache()
+            self.warm()
+
+
+class LookupHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                with tracing.joined(request.get("trace")), tracing.span("lookup_server.request"):
+                    self.server.refresh()
+                    response = lookup_usda.run_lookup(request)
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+def is_running(path: Path) -> bool:
+    """True if something is accepting connections on the socket."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(path))
+        return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident USDA lookup server")
+    parser.add_argument("--socket", type=str, help=f"Socket path (default: {lookup_usda.SOCKET_PATH})")
+    add_trace_argument(parser)
+
+    args = parser.parse_args()
+    start_tracing(args.trace)
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: Unix sockets are not available on this platform")
+        sys.exit(1)
+
+    path = Path(args.socket) if args.socket else lookup_usda.SOCKET_PATH
+    if path.exists():
+        if is_running(path):
+            print(f"Lookup server already running on {path}")
+            sys.exit(1)
+        path.unlink()  # left over from a server that didn't shut down cleanly
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # `kill` should clean up the socket just like Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    with LookupServer(str(path), LookupHandler) as server:
+        server.warm()
+        print(f"Serving USDA lookups on {path} ({len(lookup_usda.load_data())} foods)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,26 @@
 """Search USDA Foundation Foods database for nutritional information."""
 
 import argparse
+import codecs
+import hashlib
 import json
+import os
+import pickle
 import re
+import socket
+import sqlite3
 from pathlib import Path
 
+import tracing
+from tracing import add_trace_argument, start_tracing
+
 DATA_FILE = Path(__file__).parent.parent / "data" / "usda" / "FoodData_Central_foundation_food_json_2025-12-18.json"
+CACHE_DIR = Path(__file__).parent.parent / "data" / "usda" / "cache"
+# Where lookup_server.py listens; override if the repo path is too long for a socket
+SOCKET_PATH = Path(os.environ.get("BITE_LOOKUP_SOCKET", CACHE_DIR / "lookup.sock"))
+
+# Bump when the compiled store layout changes so old caches get rebuilt
+STORE_VERSION = 4
 
 # Map USDA nutrient names to our CSV columns
 NUTRIENT_MAP = {
@@ -52,15 +67,342 @@ NUTRIENT_MAP = {
     "PUFA 22:6 n-3 (DHA)": "omega_3_dha_g",
 }
 
+# Store columns, in order; "Energy" maps to calories (kcal only, see compile_food)
+NUTRIENT_COLUMNS = list(dict.fromkeys(NUTRIENT_MAP.values()))
+_NUTRIENT_SQL = ", ".join(NUTRIENT_COLUMNS)
+
+# Description tokenizer shared by search scoring and the token index
+_WORD_SPLIT = re.compile(r'[\s,]+')
+
+# Bytes read from a USDA file at a time while streaming it (see iter_foods)
+READ_SIZE = 1 << 20
+# Largest single record iter_foods buffers before calling the file malformed
+MAX_RECORD_SIZE = 64 << 20
+# Foods compiled per insert while building the store
+INSERT_BATCH = 5000
+# Share of the store a query's index candidates may cover; above it (common
+# short words like "a") scoring every cached description is cheaper
+BROAD_QUERY = 0.1
+
+_NON_SPACE = re.compile(r'\S')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_DECODER = json.JSONDecoder()
+
 _data_cache = None
+_store_conn = None
+_fuzzy_tree = None
+_descriptions = None
+
+def compile_food(food: dict) -> dict:
+    """Reduce a raw FoodData Central record to the fields we actually use."""
+    nutrients = {}
+    for fn in food.get("foodNutrients", []):
+        nutrient = fn.get("nutrient", {})
+        name = nutrient.get("name", "")
+        amount = fn.get("amount")
+
+        if amount is None:
+            continue
+
+        # Handle Energy specially - we want kcal
+        if name == "Energy":
+            unit = nutrient.get("unitName", "")
+            if unit.lower() == "kcal":
+                nutrients["calories"] = round(amount, 1)
+        elif name in NUTRIENT_MAP:
+            col = NUTRIENT_MAP[name]
+            nutrients[col] = round(amount, 3)
+
+    portions = []
+    for p in food.get("foodPortions", []):
+        name = p.get("portionDescription") or p.get("measureUnit", {}).get("name", "portion")
+        grams = p.get("gramWeight")
+        if grams:
+            portions.append({"name": name, "grams": round(grams, 1)})
+    # Branded foods have a labelled serving instead of portions
+    serving = food.get("servingSize")
+    if not portions and serving and str(food.get("servingSizeUnit", "")).lower() in ("g", "grm"):
+        portions.append({"name": food.get("householdServingFullText") or "serving", "grams": round(serving, 1)})
+
+    return {
+        "fdcId": food["fdcId"],
+        "description": food["description"],
+        "nutrients": nutrients,
+        "portions": portions,
+    }
+
+class _JsonStream:
+    """Reads JSON values one at a time from a binary file, a chunk at a time."""
+
+    def __init__(self, f, hasher=None):
+        self.f = f
+        self.hasher = hasher
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        """Add the next chunk to the buffer, dropping what was consumed; False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_SIZE)
+        if self.hasher:
+            self.hasher.update(chunk)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, not consumed ('' at end of file)."""
+        while True:
+            match = _NON_SPACE.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.more():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next non-whitespace character, which must be one of `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"invalid USDA JSON: expected {' or '.join(map(repr, chars))}, "
+                             f"got {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next JSON value, reading until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if len(self.buf) - self.pos > MAX_RECORD_SIZE or not self.more():
+                    raise ValueError(f"invalid USDA JSON: {e.msg}") from None
+                continue
+            # A number followed by nothing but number characters may go on in the
+            # next chunk: "12" and "12." decode as 12 but can be the start of "12.5"
+            if (isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(self.buf, end)
+                    and self.more()):
+                continue
+            self.pos = end
+            return value
+
+def iter_foods(source: Path = None, hasher=None):
+    """Yield the food records of a FoodData Central JSON file one at a time.
+
+    The file is read in READ_SIZE chunks and each record decoded once it is
+    complete, so memory holds about a chunk and a record whatever the file
+    size. Any download whose top-level object keeps its foods in a
+    "...Foods" list works (FoundationFoods, SRLegacyFoods, BrandedFoods).
+    Every byte read also goes to `hasher`, if given. Raises ValueError if
+    the file isn't valid JSON of that shape.
+    """
+    with open(source or DATA_FILE, "rb") as f:
+        stream = _JsonStream(f, hasher)
+        stream.expect("{")
+        if stream.peek() == "}":
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.value()
+                stream.expect(":")
+                if isinstance(key, str) and key.endswith("Foods") and stream.peek() == "[":
+                    stream.expect("[")
+                    if stream.peek() == "]":
+                        stream.pos += 1
+                    else:
+                        while True:
+                            yield stream.value()
+                            if stream.expect(",]") == "]":
+                                break
+                else:
+                    stream.value()
+                if stream.expect(",}") == "}":
+                    break
+        if stream.peek():
+            raise ValueError("invalid USDA JSON: data after the top-level object")
+
+def store_path(source: Path = None) -> Path:
+    """Path of the compiled store for a USDA JSON file."""
+    source = source or DATA_FILE
+    return CACHE_DIR / f"{source.stem}.sqlite3"
+
+def _source_stamp(source: Path) -> dict:
+    st = source.stat()
+    return {"size": str(st.st_size), "mtime_ns": str(st.st_mtime_ns)}
+
+def _source_hash(source: Path) -> str:
+    h = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _read_meta(conn) -> dict:
+    try:
+        return dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError:
+        return {}
+
+def _write_meta(conn, meta: dict):
+    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+
+@tracing.traced("usda.build_store")
+def build_store(source: Path = None) -> Path:
+    """Compile a USDA JSON file into the SQLite lookup store.
+
+    The store keeps only descriptions, portions and the NUTRIENT_MAP columns,
+    plus an inverted index of description tokens and a BK-tree over that
+    vocabulary for search_foods, stamped with the source size/mtime/hash so
+    stale stores are detected.
+    Foods are streamed from the file (iter_foods) and inserted INSERT_BATCH
+    at a time, so only the vocabulary grows with the file.
+    The new store is written next to the old one and swapped in atomically.
+    """
+    source = source or DATA_FILE
+    path = store_path(source)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    tmp.unlink(missing_ok=True)
+
+    cols = ", ".join(f"{c} REAL" for c in NUTRIENT_COLUMNS)
+    placeholders = ", ".join("?" for _ in range(len(NUTRIENT_COLUMNS) + 4))
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(f"CREATE TABLE foods (id INTEGER PRIMARY KEY, fdc_id INTEGER NOT NULL, "
+                     f"description TEXT NOT NULL, portions TEXT NOT NULL, {cols})")
+        conn.execute("CREATE TABLE postings (token TEXT NOT NULL, food INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE vocab (token TEXT PRIMARY KEY)")
+        conn.execute("CREATE TABLE fuzzy_index (tree BLOB NOT NULL)")
+
+        def insert(rows, postings):
+            conn.executemany(f"INSERT INTO foods (id, fdc_id, description, portions, "
+                             f"{_NUTRIENT_SQL}) VALUES ({placeholders})", rows)
+            conn.executemany("INSERT INTO postings (token, food) VALUES (?, ?)", postings)
+
+        hasher = hashlib.sha256()
+        foods = tracing.rows("usda.parse_json", iter_foods(source, hasher), file=source.name)
+        rows = []
+        postings = []
+        # ids follow file order, which search_foods relies on to break score ties
+        for food_id, food in enumerate(foods, start=1):
+            c = compile_food(food)
+            rows.append((food_id, c["fdcId"], c["description"], json.dumps(c["portions"]),
+                         *(c["nutrients"].get(col) for col in NUTRIENT_COLUMNS)))
+            for token in set(_WORD_SPLIT.split(c["description"].lower())):
+                postings.append((token, food_id))
+            if len(rows) >= INSERT_BATCH:
+                insert(rows, postings)
+                rows, postings = [], []
+        insert(rows, postings)
+        conn.execute("INSERT INTO vocab (token) SELECT DISTINCT token FROM postings")
+        vocab = [token for (token,) in conn.execute("SELECT token FROM vocab")]
+        conn.execute("INSERT INTO fuzzy_index (tree) VALUES (?)",
+                     (pickle.dumps(build_bk_tree(vocab), pickle.HIGHEST_PROTOCOL),))
+        conn.execute("CREATE INDEX foods_fdc_id ON foods (fdc_id)")
+        conn.execute("CREATE INDEX postings_token ON postings (token)")
+        _write_meta(conn, {
+            "version": str(STORE_VERSION),
+            "source": source.name,
+            "sha256": hasher.hexdigest(),
+            **_source_stamp(source),
+        })
+        conn.commit()
+    except BaseException:
+        conn.close()
+        tmp.unlink(missing_ok=True)  # e.g. the file turned out to be malformed halfway
+        raise
+    conn.close()
+    os.replace(tmp, path)
+    return path
+
+@tracing.traced("usda.open_store")
+def open_store(source: Path = None):
+    """Open the compiled store, (re)building it if missing or stale."""
+    source = source or DATA_FILE
+    path = store_path(source)
+    if path.exists():
+        conn = sqlite3.connect(path)
+        meta = _read_meta(conn)
+        if meta.get("version") == str(STORE_VERSION):
+            stamp = _source_stamp(source)
+            if all(meta.get(k) == v for k, v in stamp.items()):
+                return conn
+            # Touched but unchanged (e.g. fresh checkout) - just restamp
+            if meta.get("sha256") == _source_hash(source):
+                _write_meta(conn, stamp)
+                conn.commit()
+                return conn
+        conn.close()
+    return sqlite3.connect(build_store(source))
+
+def _row_to_food(row) -> dict:
+    fdc_id, description, portions, *values = row
+    return {
+        "fdcId": fdc_id,
+        "description": description,
+        "nutrients": {col: v for col, v in zip(NUTRIENT_COLUMNS, values) if v is not None},
+        "portions": json.loads(portions),
+    }
+
+def _store():
+    """Shared connection to the compiled store for this process."""
+    global _store_conn
+    if _store_conn is None:
+        _store_conn = open_store()
+    return _store_conn
+
+_FOOD_SELECT = f"SELECT fdc_id, description, portions, {_NUTRIENT_SQL} FROM foods"
 
 def load_data():
     global _data_cache
     if _data_cache is None:
-        with open(DATA_FILE) as f:
-            _data_cache = json.load(f)["FoundationFoods"]
+        with tracing.span("usda.load_data") as span:
+            rows = _store().execute(f"{_FOOD_SELECT} ORDER BY id")
+            _data_cache = [_row_to_food(r) for r in rows]
+            span["foods"] = len(_data_cache)
     return _data_cache
 
+def reset_cache():
+    """Drop the in-memory dataset and indexes (e.g. after the source changed)."""
+    global _data_cache, _store_conn, _fuzzy_tree, _descriptions
+    if _store_conn is not None:
+        _store_conn.close()
+    _data_cache = _store_conn = _fuzzy_tree = _descriptions = None
+
+def dataset_version() -> str:
+    """Identify the USDA data in use: source file name plus content hash."""
+    meta = _read_meta(_store())
+    return f"{meta['source']}@{meta['sha256'][:12]}"
+
+@tracing.traced("usda.get_food")
+def get_food(fdc_id: int):
+    """Look up a single food by FDC ID via the store index (None if unknown)."""
+    row = _store().execute(f"{_FOOD_SELECT} WHERE fdc_id = ? ORDER BY id LIMIT 1",
+                           (fdc_id,)).fetchone()
+    return _row_to_food(row) if row else None
+
+@tracing.traced("usda.get_foods")
+def get_foods(fdc_ids) -> dict:
+    """Look up several foods by FDC ID in one pass; unknown ids are left out."""
+    found = {}
+    fdc_ids = list(dict.fromkeys(fdc_ids))
+    for start in range(0, len(fdc_ids), 500):
+        chunk = fdc_ids[start:start + 500]
+        rows = _store().execute(f"{_FOOD_SELECT} WHERE fdc_id IN ({', '.join('?' * len(chunk))}) "
+                                f"ORDER BY id DESC", chunk)
+        # Descending so the first food wins on a duplicate id, as in get_food
+        for row in rows:
+            found[row[0]] = _row_to_food(row)
+    tracing.note(ids=len(fdc_ids), found=len(found))
+    return found
+
 def levenshtein_distance(s1: str, s2: str) -> int:
     """Calculate Levenshtein distance between two strings."""
     if len(s1) < len(s2):
@@ -80,6 +422,181 @@ def levenshtein_distance(s1: str, s2: str) -> int:
 
     return previous_row[-1]
 
+def build_bk_tree(words: list):
+    """Build a BK-tree over words: nodes are (word, {distance: child})."""
+    root = None
+    for word in words:
+        if root is None:
+            root = (word, {})
+            continue
+        node = root
+        while True:
+            dist = levenshtein_distance(word, node[0])
+            child = node[1].get(dist)
+            if child is None:
+                node[1][dist] = (word, {})
+                break
+            node = child
+    return root
+
+def bk_tree_search(tree, word: str, max_dist: int) -> dict:
+    """All words in the tree within max_dist of word, mapped to their distance."""
+    found = {}
+    stack = [tree] if tree else []
+    while stack:
+        node_word, children = stack.pop()
+        dist = levenshtein_distance(word, node_word)
+        if dist <= max_dist:
+            found[node_word] = dist
+        # Triangle inequality: only subtrees at dist +/- max_dist can match
+        for child_dist, child in children.items():
+            if dist - max_dist <= child_dist <= dist + max_dist:
+                stack.append(child)
+    return found
+
+@tracing.traced("usda.search.fuzzy")
+def _fuzzy_candidates(query_lower: str) -> dict:
+    """Foods with a description word close enough for the fuzzy tier.
+
+    Maps food id to its smallest word distance, which is what _score would
+    compute for that food.
+    """
+    global _fuzzy_tree
+    if _fuzzy_tree is None:
+        with tracing.span("usda.load_fuzzy_index"):
+            (blob,) = _store().execute("SELECT tree FROM fuzzy_index").fetchone()
+            _fuzzy_tree = pickle.loads(blob)
+    close = bk_tree_search(_fuzzy_tree, query_lower, max(2, len(query_lower) // 3))
+    conn = _store()
+    best = {}
+    tokens = list(close)
+    for start in range(0, len(tokens), 500):
+        chunk = tokens[start:start + 500]
+        for token, food in conn.execute(
+                f"SELECT token, food FROM postings WHERE token IN ({', '.join('?' * len(chunk))})", chunk):
+            if close[token] < best.get(food, close[token] + 1):
+                best[food] = close[token]
+    tracing.note(words=len(close), foods=len(best))
+    return best
+
+def _score(query_lower: str, query_words: list, desc: str, min_dist: int = None, desc_words: list = None):
+    """Relevance score of a lowercased description, or None if it doesn't match.
+
+    min_dist may carry the fuzzy distance and desc_words the description's
+    words when they are already known.
+    """
+    if desc_words is None:
+        desc_words = _WORD_SPLIT.split(desc)
+
+    # Exact match scores highest
+    if query_lower == desc:
+        return 10000
+    # Check for word boundary matches
+    elif all(w in desc_words for w in query_words):
+        # All query words match whole words in description
+        return 1000 - len(desc)  # Prefer shorter matches
+    # All words present as substrings
+    elif all(w in desc for w in query_words):
+        return 100 - len(desc)
+    # Fuzzy matching for single-word queries
+    elif len(query_words) == 1:
+        if min_dist is None:
+            min_dist = min(levenshtein_distance(query_lower, dw) for dw in desc_words)
+        # Allow fuzzy match if distance is small relative to word length
+        if min_dist <= max(2, len(query_lower) // 3):
+            return 50 - min_dist * 5 - len(desc) / 100
+        # Check if any query word is a substring match
+        elif any(w in desc for w in query_words):
+            return 10 - len(desc) / 100
+        return None
+    # Any word present
+    elif any(w in desc for w in query_words):
+        return 10 - len(desc) / 100
+    return None
+
+def word_match(query: str, description: str) -> bool:
+    """Whether a description matches a query in search_foods' top tiers: exactly, or by whole words.
+
+    For callers that only trust a result when it isn't a partial (substring)
+    or fuzzy match.
+    """
+    query_lower = query.lower()
+    desc = description.lower()
+    return query_lower == desc or all(w in _WORD_SPLIT.split(desc) for w in query_lower.split())
+
+@tracing.traced("usda.search.substring")
+def _substring_candidates(query_words: list, cap: int):
+    """Ids of foods whose description contains any query word, via the token index.
+
+    A word without separators can only occur inside a single description
+    token, so matching it against the vocabulary finds every such food.
+    Words containing commas must contain each comma-free piece, which
+    narrows to the intersection. Returns None if the index can't help,
+    including when more than `cap` foods match (the index would barely
+    narrow the search).
+    """
+    conn = _store()
+    candidates = set()
+    for word in query_words:
+        pieces = [p for p in _WORD_SPLIT.split(word) if p]
+        if not pieces:
+            return None
+        word_ids = None
+        for piece in pieces:
+            ids = {food for (food,) in conn.execute(
+                "SELECT DISTINCT food FROM postings WHERE token IN "
+                "(SELECT token FROM vocab WHERE instr(token, ?) > 0) LIMIT ?", (piece, cap + 1))}
+            word_ids = ids if word_ids is None else word_ids & ids
+        candidates |= word_ids
+        if len(candidates) > cap:
+            tracing.note(broad=word)
+            return None
+    tracing.note(foods=len(candidates))
+    return candidates
+
+def _all_descriptions() -> list:
+    """(lowercased description, its words) of every food in store order, kept for broad queries."""
+    global _descriptions
+    if _descriptions is None:
+        with tracing.span("usda.load_descriptions") as span:
+            if _data_cache is not None:
+                descs = (food["description"].lower() for food in _data_cache)
+            else:
+                descs = (d.lower() for (d,) in _store().execute("SELECT description FROM foods ORDER BY id"))
+            _descriptions = [(d, _WORD_SPLIT.split(d)) for d in descs]
+            span["foods"] = len(_descriptions)
+    return _descriptions
+
+def _descriptions_by_id(ids) -> dict:
+    """{store id: (lowercased description, its words)} for some foods, without decoding their records."""
+    if _descriptions is not None:
+        return {i: _descriptions[i - 1] for i in ids}
+    found = {}
+    ids = sorted(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for food_id, desc in _store().execute(
+                f"SELECT id, description FROM foods WHERE id IN ({', '.join('?' * len(chunk))})", chunk):
+            desc = desc.lower()
+            found[food_id] = (desc, _WORD_SPLIT.split(desc))
+    return found
+
+def _foods_by_id(ids) -> dict:
+    """Fetch foods by store id, reusing the in-memory dataset when loaded."""
+    if _data_cache is not None:
+        return {i: _data_cache[i - 1] for i in ids}
+    found = {}
+    ids = sorted(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = _store().execute(
+            f"SELECT id, fdc_id, description, portions, {_NUTRIENT_SQL} FROM foods "
+            f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        for food_id, *row in rows:
+            found[food_id] = _row_to_food(row)
+    return found
+
+@tracing.traced("usda.search")
 def search_foods(query: str, limit: int = 10) -> list:
     """Search foods by name with improved matching.
 
@@ -89,47 +606,41 @@ def search_foods(query: str, limit: int = 10) -> list:
     3. All query words present (substring)
     4. Fuzzy matches (for single-word queries)
     5. Partial word matches
+
+    Only foods sharing a substring with the query (found through the token
+    index) or, for single words, having a description word within fuzzy
+    distance (found through the BK-tree) are scored; ties keep dataset order.
+    Queries the index can't narrow to BROAD_QUERY of the store score every
+    food's cached description instead. Scoring reads descriptions only;
+    just the foods returned are fetched whole.
     """
-    foods = load_data()
     query_lower = query.lower()
     query_words = query_lower.split()
 
-    scored = []
-    for food in foods:
-        desc = food["description"].lower()
-        desc_words = re.split(r'[\s,]+', desc)
-
-        # Exact match scores highest
-        if query_lower == desc:
-            score = 10000
-        # Check for word boundary matches
-        elif all(w in desc_words for w in query_words):
-            # All query words match whole words in description
-            score = 1000 - len(desc)  # Prefer shorter matches
-        # All words present as substrings
-        elif all(w in desc for w in query_words):
-            score = 100 - len(desc)
-        # Fuzzy matching for single-word queries
-        elif len(query_words) == 1:
-            min_dist = min(levenshtein_distance(query_lower, dw) for dw in desc_words)
-            # Allow fuzzy match if distance is small relative to word length
-            if min_dist <= max(2, len(query_lower) // 3):
-                score = 50 - min_dist * 5 - len(desc) / 100
-            # Check if any query word is a substring match
-            elif any(w in desc for w in query_words):
-                score = 10 - len(desc) / 100
-            else:
-                continue
-        # Any word present
-        elif any(w in desc for w in query_words):
-            score = 10 - len(desc) / 100
-        else:
-            continue
+    (count,) = _store().execute("SELECT count(*) FROM foods").fetchone()
+    candidates = _substring_candidates(query_words, int(count * BROAD_QUERY)) if query_words else None
+    # The BK-tree finds every food within fuzzy distance, so the rest needn't be measured
+    fuzzy = _fuzzy_candidates(query_lower) if len(query_words) == 1 else {}
+    far = max(2, len(query_lower) // 3) + 1
+    if candidates is None:
+        descs = enumerate(_all_descriptions(), start=1)
+    else:
+        # Foods outside the candidates can still match the fuzzy tier
+        descs = _descriptions_by_id(candidates | fuzzy.keys()).items()
 
-        scored.append((score, food))
+    scored = []
+    with tracing.span("usda.search.score") as span:
+        for food_id, (desc, words) in descs:
+            score = _score(query_lower, query_words, desc, fuzzy.get(food_id, far), words)
+            if score is not None:
+                scored.append((-score, food_id))
+        span["matches"] = len(scored)
+    tracing.note(query=query)
 
-    scored.sort(key=lambda x: -x[0])
-    return [f for _, f in scored[:limit]]
+    scored.sort()
+    best = [food_id for _, food_id in scored[:limit]]
+    foods = _foods_by_id(best)
+    return [foods[food_id] for food_id in best]
 
 def extract_nutrients(food: dict) -> dict:
     """Extract nutrient values mapped to our CSV columns."""
@@ -137,35 +648,73 @@ def extract_nutrients(food: dict) -> dict:
         "food_name": food["description"],
         "fdcId": food["fdcId"],
     }
+    result.update(food["nutrients"])
+    return result
 
-    for fn in food.get("foodNutrients", []):
-        nutrient = fn.get("nutrient", {})
-        name = nutrient.get("name", "")
-        amount = fn.get("amount")
+def get_portions(food: dict) -> list:
+    """Get portion size options for a food."""
+    return list(food["portions"])
 
-        if amount is None:
-            continue
+@tracing.traced("usda.lookup")
+def run_lookup(request: dict) -> list:
+    """Answer a lookup request in this process.
 
-        # Handle Energy specially - we want kcal
-        if name == "Energy":
-            unit = nutrient.get("unitName", "")
-            if unit == "kcal":
-                result["calories"] = round(amount, 1)
-        elif name in NUTRIENT_MAP:
-            col = NUTRIENT_MAP[name]
-            result[col] = round(amount, 3)
+    request is {"query": str}, {"id": int}, {"ids": [int, ...]} or
+    {"queries": [str, ...]}, with optional "limit" and "portions". Returns
+    the records `lookup_usda.py --json` prints; for "ids", in request order
+    with unknown ids skipped; for "queries", the best match for each query
+    in order, None where nothing matches. {"version": true} returns
+    [dataset_version()].
+    """
+    if request.get("version"):
+        return [dataset_version()]
+    if request.get("ids"):
+        foods = get_foods(int(i) for i in request["ids"])
+        matches = [foods[int(i)] for i in request["ids"] if int(i) in foods]
+    elif request.get("queries"):
+        matches = [next(iter(search_foods(q, 1)), None) for q in request["queries"]]
+    elif request.get("id"):
+        food = get_food(int(request["id"]))
+        matches = [food] if food else []
+    else:
+        matches = search_foods(request["query"], int(request.get("limit", 5)))
 
-    return result
+    results = []
+    for food in matches:
+        if food is None:
+            results.append(None)
+            continue
+        nutrients = extract_nutrients(food)
+        if request.get("portions"):
+            nutrients["portions"] = get_portions(food)
+        results.append(nutrients)
+    return results
 
-def get_portions(food: dict) -> list:
-    """Get portion size options for a food."""
-    portions = []
-    for p in food.get("foodPortions", []):
-        name = p.get("portionDescription") or p.get("measureUnit", {}).get("name", "portion")
-        grams = p.get("gramWeight")
-        if grams:
-            portions.append({"name": name, "grams": round(grams, 1)})
-    return portions
+@tracing.traced("usda.query_server")
+def query_server(request: dict, timeout: float = 5.0):
+    """Send a request to a running lookup_server.py; None if none answers."""
+    if not hasattr(socket, "AF_UNIX") or not SOCKET_PATH.exists():
+        return None
+    if tracing.enabled():
+        request = {**request, "trace": tracing.context()}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(SOCKET_PATH))
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    # Errors come back as {"error": ...}; let the in-process path report them
+    return response if isinstance(response, list) else None
+
+def lookup(request: dict) -> list:
+    """Answer a lookup request via the resident server if running, else in-process."""
+    results = query_server(request)
+    if results is None:
+        results = run_lookup(request)
+    return results
 
 def main():
     parser = argparse.ArgumentParser(description="Search USDA food database")
@@ -174,30 +723,29 @@ def main():
     parser.add_argument("--limit", type=int, default=5, help="Max results")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
     parser.add_argument("--portions", action="store_true", help="Include portion sizes")
+    parser.add_argument("--build", action="store_true", help="Rebuild the compiled lookup store")
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    start_tracing(args.trace)
+
+    if args.build:
+        path = build_store()
+        print(f"Built {path}")
+        if not args.query and not args.id:
+            return
 
     if not args.query and not args.id:
         parser.print_help()
         return
 
-    if args.id:
-        foods = load_data()
-        matches = [f for f in foods if f["fdcId"] == args.id]
-    else:
-        matches = search_foods(args.query, args.limit)
+    results = lookup({"query": args.query, "id": args.id, "limit": args.limit,
+                      "portions": args.portions})
 
-    if not matches:
+    if not results:
         print(f"No foods found matching '{args.query or args.id}'")
         return
 
-    results = []
-    for food in matches:
-        nutrients = extract_nutrients(food)
-        if args.portions:
-            nutrients["portions"] = get_portions(food)
-        results.append(nutrients)
-
     if args.json:
         print(json.dumps(results, indent=2))
     else:
@@ -3,23 +3,74 @@
 
 import argparse
 import json
-from pathlib import Path
 
-TEMPLATES_FILE = Path(__file__).parent.parent / "data" / "templates.json"
+import nutrition
+import tracing
+from intake_store import NUTRIENT_COLUMNS, add_profile_argument, profile_dir, use_profile
+from log_entry import scale_nutrients
+from tracing import add_trace_argument, start_tracing
 
+def templates_file():
+    """Templates JSON file of the active profile"""
+    return profile_dir() / "templates.json"
+
+@tracing.traced("templates.load")
 def load_templates():
     """Load templates from JSON file"""
-    if TEMPLATES_FILE.exists():
-        with open(TEMPLATES_FILE, "r") as f:
+    path = templates_file()
+    if path.exists():
+        with open(path, "r") as f:
             return json.load(f)
     return {}
 
+@tracing.traced("templates.save")
 def save_templates(templates):
     """Save templates to JSON file"""
-    TEMPLATES_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(TEMPLATES_FILE, "w") as f:
+    path = templates_file()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
         json.dump(templates, f, indent=2)
 
+def snapshot_template(template):
+    """Store each food's nutrients for its serving, plus template totals
+
+    Foods with a 'usda_fdc_id' get a 'nutrients' dict scaled to 'amount_g';
+    the template records the totals and which USDA dataset they came from,
+    so logging it needs no lookups. Foods without an FDC ID contribute nothing;
+    a template with none of them doesn't depend on a dataset (None). If the
+    USDA lookup fails the template is left without a snapshot, so logging it
+    looks its foods up.
+    """
+    foods = template.get("foods", [])
+    for food in foods:
+        food.pop("nutrients", None)
+    fdc_ids = [f["usda_fdc_id"] for f in foods if f.get("usda_fdc_id")]
+    try:
+        records = nutrition.get_many(fdc_ids)
+        dataset = nutrition.dataset_version() if fdc_ids else None
+    except Exception as e:
+        print(f"  Warning: USDA lookup failed: {e} - no nutrients saved")
+        template.pop("totals", None)
+        template.pop("dataset", None)
+        return template
+
+    totals = {}
+    for food in foods:
+        fdc_id = food.get("usda_fdc_id")
+        if not fdc_id:
+            continue
+        if int(fdc_id) not in records:
+            print(f"  Warning: FDC ID {fdc_id} not found for {food['food_name']} - no nutrients saved")
+            continue
+        scaled = scale_nutrients(records[int(fdc_id)], float(food["amount_g"]))
+        food["nutrients"] = {col: scaled[col] for col in NUTRIENT_COLUMNS if col in scaled}
+        for col, val in food["nutrients"].items():
+            totals[col] = round(totals.get(col, 0) + val, 3)
+
+    template["totals"] = totals
+    template["dataset"] = dataset
+    return template
+
 def add_template(name, foods):
     """Add a new template
 
@@ -28,13 +79,35 @@ def add_template(name, foods):
         foods: List of dicts with 'food_name', 'amount_g', and optional 'usda_fdc_id'
     """
     templates = load_templates()
-    templates[name] = {
+    templates[name] = snapshot_template({
         "foods": foods,
         "description": f"Template with {len(foods)} items"
-    }
+    })
     save_templates(templates)
     print(f"Added template '{name}' with {len(foods)} foods")
 
+def refresh_templates(name=None):
+    """Recompute saved nutrients for one or all templates (e.g. after a dataset update)"""
+    templates = load_templates()
+    if name and name not in templates:
+        print(f"Template '{name}' not found")
+        return False
+
+    names = [name] if name else list(templates)
+    for n in names:
+        snapshot_template(templates[n])
+        print(f"Refreshed '{n}'")
+    save_templates(templates)
+    versions = {templates[n].get("dataset") for n in names} - {None}
+    if versions:
+        print(f"Nutrients now from {versions.pop()}")
+    return True
+
+def format_totals(totals):
+    """One-line macro summary of a template's saved totals"""
+    return (f"{totals.get('calories', 0):.0f} cal, {totals.get('protein_g', 0):.1f}g protein, "
+            f"{totals.get('carbs_g', 0):.1f}g carbs, {totals.get('fat_g', 0):.1f}g fat")
+
 def list_templates():
     """List all templates"""
     templates = load_templates()
@@ -49,6 +122,8 @@ def list_templates():
         for food in foods:
             fdc = f" (FDC: {food['usda_fdc_id']})" if food.get('usda_fdc_id') else ""
             print(f"    - {food['food_name']}: {food['amount_g']}g{fdc}")
+        if "totals" in data:
+            print(f"    Total: {format_totals(data['totals'])}")
         print()
 
 def get_template(name):
@@ -78,9 +153,15 @@ def main():
     parser.add_argument("--add", type=str, help="Add new template (name)")
     parser.add_argument("--foods", type=str, help="Foods JSON for --add: [{\"food_name\": \"...\", \"amount_g\": 100}]")
     parser.add_argument("--delete", type=str, help="Delete template by name")
+    parser.add_argument("--refresh", type=str, nargs="?", const="", metavar="NAME",
+                        help="Recompute saved nutrients for a template (all if no name), e.g. after a USDA update")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
     if args.list:
         if args.json:
@@ -99,6 +180,8 @@ def main():
                 for food in template.get("foods", []):
                     fdc = f" (FDC: {food['usda_fdc_id']})" if food.get('usda_fdc_id') else ""
                     print(f"  - {food['food_name']}: {food['amount_g']}g{fdc}")
+                if "totals" in template:
+                    print(f"  Total: {format_totals(template['totals'])}")
 
     elif args.add:
         if not args.foods:
@@ -117,6 +200,17 @@ def main():
                 if "food_name" not in food or "amount_g" not in food:
                     print("Error: Each food must have 'food_name' and 'amount_g'")
                     return
+                try:
+                    float(food["amount_g"])
+                except (TypeError, ValueError):
+                    print(f"Error: amount_g must be a number for '{food['food_name']}'")
+                    return
+                if food.get("usda_fdc_id"):
+                    try:
+                        int(food["usda_fdc_id"])
+                    except (TypeError, ValueError):
+                        print(f"Error: usda_fdc_id must be an integer for '{food['food_name']}'")
+                        return
 
             add_template(args.add, foods)
         except json.JSONDecodeError as e:
@@ -125,6 +219,9 @@ def main():
     elif args.delete:
         delete_template(args.delete)
 
+    elif args.refresh is not None:
+        refresh_templates(args.refresh or None)
+
     else:
         parser.print_help()
 
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Nutrition lookup API for use from other scripts.
+
+Wraps lookup_usda so callers get plain per-100g records (food_name, fdcId
+and the mapped nutrient columns, plus portions on request) without
+spawning lookup_usda.py. Goes through the resident lookup server when it
+is running, otherwise answers in this process.
+"""
+
+from lookup_usda import lookup
+
+
+def search(query: str, limit: int = 5, portions: bool = False) -> list:
+    """Best matching foods for a free-text query."""
+    return lookup({"query": query, "limit": limit, "portions": portions})
+
+
+def get_by_id(fdc_id: int, portions: bool = False):
+    """Per-100g record for one FDC ID, or None if unknown."""
+    results = lookup({"id": int(fdc_id), "portions": portions})
+    return results[0] if results else None
+
+
+def get_many(fdc_ids, portions: bool = False) -> dict:
+    """Per-100g records for several FDC IDs in one lookup, keyed by FDC ID.
+
+    Unknown ids are left out.
+    """
+    fdc_ids = [int(i) for i in fdc_ids]
+    if not fdc_ids:
+        return {}
+    results = lookup({"ids": fdc_ids, "portions": portions})
+    return {r["fdcId"]: r for r in results}
+
+
+def search_many(queries, portions: bool = False) -> dict:
+    """Best match for each of several queries in one lookup, keyed by query.
+
+    Queries with no match map to None.
+    """
+    queries = list(dict.fromkeys(queries))
+    if not queries:
+        return {}
+    results = lookup({"queries": queries, "portions": portions})
+    return dict(zip(queries, results))
+
+
+def dataset_version() -> str:
+    """The USDA dataset lookups are answered from (see lookup_usda.dataset_version)."""
+    return lookup({"version": True})[0]
+
+
+def get_portions(fdc_id: int) -> list:
+    """Portion sizes ({"name", "grams"}) for one FDC ID; empty if unknown."""
+    record = get_by_id(fdc_id, portions=True)
+    return record["portions"] if record else []
@@ -2,39 +2,28 @@
 """Search for entries in intake.csv"""
 
 import argparse
-import csv
-from pathlib import Path
 
-DATA_FILE = Path(__file__).parent.parent / "data" / "intake.csv"
+from intake_store import add_profile_argument, open_store, use_profile
+from tracing import add_trace_argument, start_tracing
 
 def main():
     parser = argparse.ArgumentParser(description="Search intake entries")
     parser.add_argument("--food", type=str, help="Search by food name (partial match)")
     parser.add_argument("--date", type=str, help="Filter by date (YYYY-MM-DD)")
     parser.add_argument("--limit", type=int, default=10, help="Max results (default 10)")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
 
-    if not DATA_FILE.exists():
+    store = open_store()
+    if not store.exists():
         print("No intake data file found")
         return
 
-    matches = []
-    with open(DATA_FILE, "r") as f:
-        reader = csv.DictReader(f)
-        for row_num, row in enumerate(reader, start=2):  # start=2 because row 1 is header
-            match = True
-
-            if args.food:
-                if args.food.lower() not in row.get("food_name", "").lower():
-                    match = False
-
-            if args.date:
-                if not row.get("timestamp", "").startswith(args.date):
-                    match = False
-
-            if match:
-                matches.append((row_num, row))
+    matches = store.search(food=args.food, date=args.date)
 
     if not matches:
         print("No matching entries found")
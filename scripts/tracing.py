@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Opt-in timing spans, for finding where a slow command spends its time.
+
+Tracing is off unless a script runs with --trace or BITE_TRACE=FILE is
+set. Spans are appended to FILE (with --trace alone, data/trace.jsonl) as
+JSON lines when they end:
+
+    {"trace": "9f2c41d07be3a815", "span": "4242.3", "parent": "4242.1", "name": "intake.read",
+     "script": "daily_summary", "start": 1767225600.123456, "ms": 4.211, "file": "intake.csv", "rows": 1200}
+
+A traced process records "startup" (from process start until the script
+began its work: interpreter start-up, imports and argument parsing; Linux
+only, to 10 ms) and a span named after the script for the rest of the
+run. Inside it the stores and lookups record USDA dataset loads, builds
+and JSON parsing, index lookups, the search tiers, intake reads (time
+spent reading and parsing rows only, with the row count), rollups,
+aggregation and writes.
+
+All spans of one command share a trace id. Processes a traced script
+starts inherit it through the environment (BITE_TRACE_ID and
+BITE_TRACE_PARENT), and lookups sent to lookup_server.py carry it in the
+request, so their spans hang under the span that asked (the server
+writes them to its own trace file if it runs with tracing).
+
+    BITE_TRACE=/tmp/bite.jsonl python3 scripts/daily_summary.py
+    python3 scripts/log_entry.py --food "chicken breast" --amount 150 --trace
+    python3 scripts/tracing.py                 # span tree of the last trace in data/trace.jsonl
+    python3 scripts/tracing.py /tmp/bite.jsonl --all
+"""
+
+import argparse
+import atexit
+import contextlib
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+TRACE_FILE = Path(__file__).parent.parent / "data" / "trace.jsonl"
+TRACE_ENV = "BITE_TRACE"
+TRACE_ID_ENV = "BITE_TRACE_ID"
+PARENT_ENV = "BITE_TRACE_PARENT"
+
+# Keys every span has; the rest are the span's own attributes
+SPAN_KEYS = ("trace", "span", "parent", "name", "script", "start", "ms")
+
+_fd = None  # trace file, while tracing is on
+_trace_id = None
+_root = None  # (trace id, span id) spans outside any other hang under
+_script = None
+_ids = itertools.count(1)
+_local = threading.local()
+
+
+def enabled() -> bool:
+    return _fd is not None
+
+
+def _stack() -> list:
+    """Open spans of this thread, innermost last, as [trace id, span id, attributes]."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _current() -> tuple:
+    stack = _stack()
+    return tuple(stack[-1][:2]) if stack else _root
+
+
+def _new_id() -> str:
+    return f"{os.getpid()}.{next(_ids)}"
+
+
+def _record(trace_id: str, span_id: str, parent, name: str, start: float, seconds: float, attrs: dict):
+    record = {"trace": trace_id, "span": span_id, "parent": parent, "name": name, "script": _script,
+              "start": round(start, 6), "ms": round(seconds * 1000, 3), **attrs}
+    try:
+        # One write per line on an O_APPEND descriptor, so processes can share the file
+        os.write(_fd, (json.dumps(record, default=str) + "\n").encode())
+    except (OSError, TypeError):
+        pass  # tracing never breaks the command
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time the with-block as a span; yields its attributes, which the block may add to."""
+    if _fd is None:
+        yield attrs
+        return
+    trace_id, parent = _current()
+    span_id = _new_id()
+    stack = _stack()
+    stack.append([trace_id, span_id, attrs])
+    start, began = time.time(), time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        _record(trace_id, span_id, parent, name, start, time.perf_counter() - began, attrs)
+
+
+def traced(name: str):
+    """Decorator: run the function in span(name)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            if _fd is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return call
+    return decorate
+
+
+def note(**attrs):
+    """Add attributes (e.g. row counts) to the innermost open span."""
+    stack = _stack() if _fd is not None else None
+    if stack:
+        stack[-1][2].update(attrs)
+
+
+def rows(name: str, iterable, **attrs):
+    """`iterable`, recorded as a span of the time spent producing its items.
+
+    Meant for lazy reads: the span covers only the time inside the
+    iterator (reading and parsing), not the caller's work between items,
+    adds the item count as "rows" and is written once the iterator is
+    exhausted or closed. Returns `iterable` itself when tracing is off.
+    """
+    if _fd is None:
+        return iterable
+    return _timed_rows(name, iter(iterable), attrs)
+
+
+def _timed_rows(name: str, iterator, attrs: dict):
+    trace_id, parent = _current()
+    span_id = _new_id()
+    stack = _stack()
+    start, spent, count = time.time(), 0.0, 0
+    try:
+        while True:
+            stack.append([trace_id, span_id, attrs])
+            began = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - began
+                stack.pop()
+            count += 1
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+        _record(trace_id, span_id, parent, name, start, spent, {**attrs, "rows": count})
+
+
+def context():
+    """{"id", "parent"} linking another process's spans to the current span, or None when not tracing."""
+    if _fd is None:
+        return None
+    trace_id, span_id = _current()
+    return {"id": trace_id, "parent": span_id}
+
+
+@contextlib.contextmanager
+def joined(ctx):
+    """Record the with-block's spans under another process's context()."""
+    if _fd is None or not isinstance(ctx, dict) or not ctx.get("id"):
+        yield
+        return
+    stack = _stack()
+    stack.append([str(ctx["id"]), ctx.get("parent"), {}])
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def _process_age():
+    """Seconds since this process started, or None without /proc."""
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def start_tracing(on: bool = False, script: str = None):
+    """Turn tracing on for this process if `on` (--trace) or BITE_TRACE is set.
+
+    Spans go to the BITE_TRACE file, else data/trace.jsonl. Records the
+    startup span and opens the script's span, which ends when the process
+    exits. Does nothing if tracing is already on.
+    """
+    global _fd, _trace_id, _root, _script
+    path = os.environ.get(TRACE_ENV) or (TRACE_FILE if on else None)
+    if not path or _fd is not None:
+        return
+    path = Path(path).expanduser().resolve()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    except OSError as e:
+        print(f"Warning: not tracing, can't write {path}: {e}", file=sys.stderr)
+        return
+    _script = script or Path(sys.argv[0]).stem
+    _trace_id = os.environ.get(TRACE_ID_ENV) or uuid.uuid4().hex[:16]
+    parent = os.environ.get(PARENT_ENV) or None
+    start, began = time.time(), time.perf_counter()
+    age = _process_age()
+    if age is not None:
+        _record(_trace_id, _new_id(), parent, "startup", start - age, age, {})
+    _root = (_trace_id, _new_id())
+    os.environ.update({TRACE_ENV: str(path), TRACE_ID_ENV: _trace_id, PARENT_ENV: _root[1]})
+    argv = sys.argv[1:]
+    atexit.register(lambda: _record(_trace_id, _root[1], parent, _script, start,
+                                    time.perf_counter() - began, {"argv": argv}))
+
+
+def add_trace_argument(parser):
+    """Add --trace to a script's parser; pass args.trace to start_tracing()."""
+    parser.add_argument("--trace", action="store_true",
+                        help="Append timing spans as JSON lines to data/trace.jsonl "
+                             "(or to the file BITE_TRACE names)")
+
+
+def load_spans(path: Path) -> dict:
+    """{trace id: [span, ...]} from a trace file, traces in the order they started."""
+    traces = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                traces.setdefault(record["trace"], []).append(record)
+            except (ValueError, KeyError, TypeError):
+                continue  # a line cut short by a crash
+    return dict(sorted(traces.items(), key=lambda t: min(s["start"] for s in t[1])))
+
+
+def _attributes(group: list) -> str:
+    """Attributes of a group of same-named sibling spans: numbers summed, text shown if shared."""
+    cells = []
+    for key in dict.fromkeys(k for s in group for k in s if k not in SPAN_KEYS):
+        values = [s[key] for s in group if key in s]
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            cells.append(f"{key}={round(sum(values), 3):g}")
+        elif len(set(map(str, values))) == 1:
+            text = " ".join(map(str, values[0])) if isinstance(values[0], list) else str(values[0])
+            cells.append(f"{key}={text[:40]}")
+    return "  ".join(cells)
+
+
+def print_trace(spans: list):
+    """Print one trace as a tree; same-named siblings are merged into one line with a count."""
+    ids = {s["span"] for s in spans}
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent"] if s["parent"] in ids else None, []).append(s)
+    first = min(spans, key=lambda s: s["start"])
+    print(f"trace {first['trace']}  {datetime.fromtimestamp(first['start']).isoformat(timespec='seconds')}")
+
+    def show(parents: list, depth: int):
+        groups = {}
+        for parent in parents:
+            for s in children.get(parent, []):
+                groups.setdefault(s["name"], []).append(s)
+        for name, group in sorted(groups.items(), key=lambda g: min(s["start"] for s in g[1])):
+            label = f"{'  ' * depth}{name}" + (f" x{len(group)}" if len(group) > 1 else "")
+            print(f"  {label:44s} {sum(s['ms'] for s in group):10.2f} ms  {_attributes(group)}".rstrip())
+            show([s["span"] for s in group], depth + 1)
+
+    show([None], 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the spans recorded with --trace as a tree")
+    parser.add_argument("file", nargs="?", type=Path, default=TRACE_FILE,
+                        help="Trace file (default: data/trace.jsonl)")
+    parser.add_argument("--id", help="Show this trace (default: the last one)")
+    parser.add_argument("--all", action="store_true", help="Show every trace in the file")
+
+    args = parser.parse_args()
+
+    if not args.file.exists():
+        print(f"Error: {args.file} not found (run a script with --trace first)")
+        sys.exit(1)
+    traces = load_spans(args.file)
+    if not traces:
+        print(f"No spans in {args.file}")
+        return
+    if args.id:
+        selected = [spans for trace_id, spans in traces.items() if trace_id.startswith(args.id)]
+        if not selected:
+            print(f"Error: no trace {args.id} in {args.file}")
+            sys.exit(1)
+    else:
+        selected = list(traces.values()) if args.all else [list(traces.values())[-1]]
+    for i, spans in enumerate(selected):
+        if i:
+            print()
+        print_trace(spans)
+
+
+if __name__ == "__main__":
+    main()
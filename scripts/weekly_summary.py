@@ -2,13 +2,12 @@
 """Weekly and monthly nutritional analysis with trends and insights."""
 
 import argparse
-import csv
-from datetime import datetime, timedelta
-from pathlib import Path
-from collections import defaultdict
+from datetime import date
 
-DATA_FILE = Path(__file__).parent.parent / "data" / "intake.csv"
-TARGETS_FILE = Path(__file__).parent.parent / "data" / "targets.csv"
+import columnar
+from aggregate import GROUPINGS, aggregate, last_days, load_targets
+from intake_store import add_profile_argument, use_profile
+from tracing import add_trace_argument, start_tracing
 
 ALL_NUTRIENT_FIELDS = [
     "calories", "protein_g", "carbs_g", "fiber_g", "sugar_g", "fat_g",
@@ -19,47 +18,6 @@ ALL_NUTRIENT_FIELDS = [
     "vitamin_b6_mg", "vitamin_b7_mcg", "vitamin_b9_mcg", "vitamin_b12_mcg"
 ]
 
-def load_targets():
-    """Load daily targets from targets.csv"""
-    targets = {}
-    if TARGETS_FILE.exists():
-        with open(TARGETS_FILE, "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                targets[row["nutrient"]] = float(row["daily_target"])
-    return targets
-
-def get_entries_in_range(start_date, end_date):
-    """Get all entries between start and end dates (inclusive)"""
-    entries_by_date = defaultdict(list)
-    with open(DATA_FILE, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            date_str = row["timestamp"].split("T")[0]
-            if start_date <= date_str <= end_date:
-                entries_by_date[date_str].append(row)
-    return entries_by_date
-
-def sum_nutrients(entries, fields):
-    """Sum nutrient values across entries"""
-    totals = {field: 0 for field in fields}
-    for entry in entries:
-        for field in fields:
-            val = entry.get(field, "")
-            if val and val.strip():
-                try:
-                    totals[field] += float(val)
-                except ValueError:
-                    pass
-    return totals
-
-def calculate_daily_totals(entries_by_date, fields):
-    """Calculate totals for each day"""
-    daily_totals = {}
-    for date, entries in entries_by_date.items():
-        daily_totals[date] = sum_nutrients(entries, fields)
-    return daily_totals
-
 def analyze_trends(daily_totals, field):
     """Analyze trend for a specific nutrient (increasing, decreasing, stable)"""
     if len(daily_totals) < 3:
@@ -85,55 +43,100 @@ def analyze_trends(daily_totals, field):
     else:
         return "stable"
 
+def iso_date(text: str) -> str:
+    """argparse type for YYYY-MM-DD dates; returns the date in ISO form."""
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{text}' (expected YYYY-MM-DD)")
+
 def main():
     parser = argparse.ArgumentParser(description="Weekly/monthly nutritional analysis")
     parser.add_argument("--days", type=int, default=7, help="Number of days to analyze (default: 7)")
     parser.add_argument("--all-nutrients", action="store_true", help="Show all tracked nutrients")
+    parser.add_argument("--start", type=iso_date, help="First date (YYYY-MM-DD); overrides --days")
+    parser.add_argument("--end", type=iso_date, help="Last date (YYYY-MM-DD, default: today)")
+    parser.add_argument("--by", choices=GROUPINGS, default="day",
+                        help="Breakdown granularity (default: day)")
+    parser.add_argument("--engine", choices=("auto", "numpy", "python"), default="auto",
+                        help="numpy: array ops over the entries; python: the rollup cache (default: numpy when installed)")
+    add_profile_argument(parser)
+    add_trace_argument(parser)
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    start_tracing(args.trace)
+    if args.engine == "numpy" and not columnar.AVAILABLE:
+        parser.error("--engine numpy requires NumPy (pip install numpy)")
+    use_numpy = columnar.AVAILABLE and args.engine != "python"
 
     # Calculate date range
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=args.days - 1)
-
-    end_str = end_date.strftime("%Y-%m-%d")
-    start_str = start_date.strftime("%Y-%m-%d")
+    start_str, end_str = last_days(args.days)
+    if args.end:
+        end_str = args.end
+        if not args.start:
+            start_str, _ = last_days(args.days, date.fromisoformat(end_str))
+    if args.start:
+        start_str = args.start
+        if start_str > end_str:
+            parser.error(f"--start {start_str} is after the end date {end_str}")
+        args.days = (date.fromisoformat(end_str) - date.fromisoformat(start_str)).days + 1
 
     print(f"{'='*60}")
     print(f"Nutritional Analysis: {start_str} to {end_str} ({args.days} days)")
     print(f"{'='*60}\n")
 
-    # Load data
+    # Load data: the entries as a float matrix, or one aggregation pass over the rollup cache
     targets = load_targets()
-    entries_by_date = get_entries_in_range(start_str, end_str)
+    if use_numpy:
+        days, day_matrix = columnar.daily_totals(*columnar.load_matrix(start_str, end_str, ALL_NUTRIENT_FIELDS))
+        daily_totals = {day: dict(zip(ALL_NUTRIENT_FIELDS, row))
+                        for day, row in zip(days.tolist(), day_matrix.tolist())}
+    else:
+        daily_totals = aggregate(start_str, end_str, "day", ALL_NUTRIENT_FIELDS)
 
-    if not entries_by_date:
+    if not daily_totals:
         print("No entries found in this date range.")
         return
 
-    days_with_data = len(entries_by_date)
+    days_with_data = len(daily_totals)
     print(f"Days with logged food: {days_with_data}/{args.days}\n")
 
-    # Calculate daily totals for key nutrients
     key_fields = ["calories", "protein_g", "carbs_g", "fat_g", "fiber_g"]
-    daily_totals = calculate_daily_totals(entries_by_date, ALL_NUTRIENT_FIELDS)
 
-    # === DAILY BREAKDOWN ===
-    print("DAILY BREAKDOWN")
-    print("-" * 60)
-    for date in sorted(entries_by_date.keys()):
-        totals = daily_totals[date]
-        print(f"{date}: {totals['calories']:.0f} cal | "
-              f"P:{totals['protein_g']:.0f}g C:{totals['carbs_g']:.0f}g F:{totals['fat_g']:.0f}g")
+    # === BREAKDOWN ===
+    if args.by == "day":
+        print("DAILY BREAKDOWN")
+        print("-" * 60)
+        for date_str in sorted(daily_totals.keys()):
+            totals = daily_totals[date_str]
+            print(f"{date_str}: {totals['calories']:.0f} cal | "
+                  f"P:{totals['protein_g']:.0f}g C:{totals['carbs_g']:.0f}g F:{totals['fat_g']:.0f}g")
+    else:
+        print(f"{'WEEKLY' if args.by == 'week' else 'MONTHLY'} BREAKDOWN (average per logged day)")
+        print("-" * 60)
+        for period, totals in aggregate(start_str, end_str, args.by, ALL_NUTRIENT_FIELDS).items():
+            n = totals["days"]
+            print(f"{period} ({n} days): {totals['calories'] / n:.0f} cal | "
+                  f"P:{totals['protein_g'] / n:.0f}g C:{totals['carbs_g'] / n:.0f}g F:{totals['fat_g'] / n:.0f}g")
     print()
 
     # === AVERAGES ===
     print("DAILY AVERAGES")
     print("-" * 60)
-    averages = {}
-    for field in ALL_NUTRIENT_FIELDS:
-        total = sum(daily_totals[d].get(field, 0) for d in daily_totals)
-        averages[field] = total / days_with_data if days_with_data > 0 else 0
+    if use_numpy:
+        means = columnar.averages(day_matrix)
+        pcts = columnar.target_percentages(means, [targets.get(f, 0) for f in ALL_NUTRIENT_FIELDS])
+        averages = dict(zip(ALL_NUTRIENT_FIELDS, means.tolist()))
+        percents = {f: p for f, p in zip(ALL_NUTRIENT_FIELDS, pcts.tolist()) if targets.get(f, 0) > 0}
+        trends = dict(zip(ALL_NUTRIENT_FIELDS, columnar.trends(day_matrix)))
+    else:
+        averages = {}
+        for field in ALL_NUTRIENT_FIELDS:
+            total = sum(daily_totals[d].get(field, 0) for d in daily_totals)
+            averages[field] = total / days_with_data if days_with_data > 0 else 0
+        percents = {f: averages[f] / targets[f] * 100 for f in ALL_NUTRIENT_FIELDS if targets.get(f, 0) > 0}
+        trends = {field: analyze_trends(daily_totals, field) for field in key_fields}
 
     # Print macros
     for field in ["calories", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g"]:
@@ -143,7 +146,7 @@ def main():
         name = field.replace("_g", "").replace("_", " ").title()
 
         if target > 0:
-            pct = (avg / target) * 100
+            pct = percents[field]
             status = "✓" if 80 <= pct <= 120 else "!"
             print(f"  {status} {name:15s}: {avg:6.1f}{unit:3s} (Target: {target:.0f}, {pct:.0f}%)")
         else:
@@ -162,7 +165,7 @@ def main():
                 name = field.replace("_mcg", "").replace("_mg", "").replace("_g", "").replace("_", " ").title()
 
                 if target > 0:
-                    pct = (avg / target) * 100
+                    pct = percents[field]
                     status = "✓" if 80 <= pct <= 120 else "!"
                     print(f"  {status} {name:20s}: {avg:6.1f}{unit:3s} (Target: {target:.0f}, {pct:.0f}%)")
                 else:
@@ -173,7 +176,7 @@ def main():
         print("\nTRENDS")
         print("-" * 60)
         for field in key_fields:
-            trend = analyze_trends(daily_totals, field)
+            trend = trends[field]
             name = field.replace("_g", "").replace("_", " ").title()
             print(f"  {name:15s}: {trend}")
 
@@ -184,9 +187,9 @@ def main():
     excesses = []
 
     for field, target in targets.items():
-        if target > 0 and field in averages:
+        if field in percents:
             avg = averages[field]
-            pct = (avg / target) * 100
+            pct = percents[field]
             name = field.replace("_g", "").replace("_mg", "").replace("_mcg", "").replace("_", " ").title()
 
             if pct < 70: